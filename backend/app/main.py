@@ -32,6 +32,8 @@ from app.services.portfolio_service import PortfolioService
 from app.services.blockchain_service import BlockchainService
 from app.services.vapi_voice_service import VapiVoiceService
 from app.services.enhanced_finvoice_service import enhanced_finvoice_service
+from app.services.free_ai_service import free_ai_service
+from app.services.ml_service import warm_fit_pool, shutdown_fit_pool
 
 # API router imports
 from app.api.v1.database_api import router as database_router
@@ -96,6 +98,7 @@ async def startup_event():
     """Initialize database and services"""
     try:
         await init_db()
+        await warm_fit_pool()
         logger.info("FinVoice application started successfully")
     except Exception as e:
         logger.error(f"Startup failed: {e}")
@@ -106,6 +109,8 @@ async def shutdown_event():
     """Cleanup resources"""
     try:
         await close_db()
+        await free_ai_service.close()
+        shutdown_fit_pool()
         logger.info("FinVoice application shutdown completed")
     except Exception as e:
         logger.error(f"Shutdown error: {e}")
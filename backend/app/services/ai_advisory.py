@@ -1282,7 +1282,7 @@ class AIAdvisoryService:
             
             # Fallback to free AI service
             logger.info("Using free AI for portfolio advice")
-            return await free_ai_service.get_portfolio_insights(portfolio_data)
+            return free_ai_service.get_portfolio_insights(portfolio_data)
             
         except Exception as e:
             logger.error(f"Error getting portfolio advice: {e}")
@@ -1391,7 +1391,7 @@ class AIAdvisoryService:
             
             # Fallback to free AI service
             logger.info("Using free AI for expense advice")
-            return await free_ai_service.get_expense_insights(expense_data)
+            return free_ai_service.get_expense_insights(expense_data)
             
         except Exception as e:
             logger.error(f"Error getting expense advice: {e}")
@@ -3,14 +3,19 @@ Expense Categorization Engine for FinVoice
 Advanced AI-powered expense categorization with Indian market context
 """
 
+import hashlib
 import json
 import logging
 import re
-from typing import Dict, List, Any, Optional, Tuple
+import time
+from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from collections import defaultdict
+from functools import lru_cache
 
+import ahocorasick
+import numpy as np
 import openai
 from decouple import config
 import redis
@@ -18,6 +23,42 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+AI_CATEGORIZATION_MODEL = "gpt-4o-mini"
+
+# Merchant patterns (e.g., "Payment to XYZ"); prefix forms take priority over the suffix form
+MERCHANT_PREFIX_PATTERN = re.compile(r"(?:payment to|paid) (.+?)(?:\s|$)")
+MERCHANT_SUFFIX_PATTERN = re.compile(r"(.+?)\s+payment")
+
+# Merchant matches at or above this confidence skip the AI and pattern lookups
+MERCHANT_SHORTCUT_CONFIDENCE = 0.9
+
+# Weight of each categorization method, in percent
+CATEGORIZATION_WEIGHTS = {
+    "merchant": 40,
+    "ai": 30,
+    "pattern": 20,
+    "keyword": 10
+}
+
+# Payment methods in priority order with their description keywords
+PAYMENT_METHODS = (
+    ("upi", ("upi", "gpay", "phonepe", "paytm", "bhim")),
+    ("card", ("card", "visa", "mastercard", "debit", "credit")),
+    ("net_banking", ("netbanking", "net banking", "online")),
+    ("cash", ("cash", "atm")),
+    ("wallet", ("wallet", "paytm wallet", "mobikwik")),
+)
+
+# AI categorization results are cached per normalized description
+AI_CACHE_TTL = 86400 * 30  # 30 days
+DIGITS_PATTERN = re.compile(r"\d+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# User patterns: a Redis hash of description -> category, a sorted set of last-seen times
+# and one set per word indexing the descriptions that contain it
+USER_PATTERNS_TTL = 86400 * 30  # 30 days
+USER_PATTERNS_LIMIT = 1000
+
 @dataclass
 class ExpenseCategory:
     id: str
@@ -42,6 +83,38 @@ class CategorizedExpense:
     location: Optional[str]
     payment_method: Optional[str]
 
+@dataclass
+class CategorizedExpenseBatch:
+    """Column-oriented view of categorized expenses for aggregation"""
+    amounts: np.ndarray
+    category_codes: np.ndarray
+    categories: Tuple[str, ...]
+    dates: np.ndarray
+    
+    @classmethod
+    def from_list(cls, expenses: List[CategorizedExpense]) -> "CategorizedExpenseBatch":
+        """Build a batch from categorized expenses, coding categories in first-seen order"""
+        category_index: Dict[str, int] = {}
+        category_codes = np.fromiter(
+            (category_index.setdefault(exp.category, len(category_index)) for exp in expenses),
+            dtype=np.int32,
+            count=len(expenses)
+        )
+        return cls(
+            amounts=np.fromiter((exp.amount for exp in expenses), dtype=np.float64, count=len(expenses)),
+            category_codes=category_codes,
+            categories=tuple(category_index),
+            dates=np.array([exp.date for exp in expenses], dtype="datetime64[us]")
+        )
+    
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+@lru_cache(maxsize=4096)
+def _description_tokens(description: str) -> frozenset:
+    """Split a lowercased description into its set of words (cached, descriptions repeat a lot)"""
+    return frozenset(description.split())
+
 class ExpenseCategorizationEngine:
     def __init__(self):
         self.openai_client = openai.OpenAI(api_key=config("OPENAI_API_KEY"))
@@ -49,9 +122,36 @@ class ExpenseCategorizationEngine:
         
         # Indian market expense categories
         self.categories = self._initialize_indian_categories()
+        self._keyword_automaton = self._build_keyword_automaton()
+        
+        # AI prompt category options and structured output schema, fixed after init
+        self._category_options_json = json.dumps({cat.id: cat.name for cat in self.categories.values()})
+        self._ai_response_format = self._build_ai_response_format()
+        
+        # Budget recommendation table, only the amounts depend on income
+        self._budget_fractions = np.array(
+            [cat.budget_percentage / 100 for cat in self.categories.values()], dtype=np.float64
+        )
+        self._budget_templates = tuple(
+            (cat_id, {"name": cat.name, "percentage": cat.budget_percentage, "color": cat.color, "icon": cat.icon})
+            for cat_id, cat in self.categories.items()
+        )
         
         # Merchant database for Indian context
         self.indian_merchants = self._initialize_merchant_database()
+        self._merchant_automaton = self._build_merchant_automaton()
+        
+        # Payment method keywords
+        self._payment_automaton = self._build_payment_automaton()
+        
+        # Description matching is pure once the tables above are built and real
+        # traffic repeats descriptions heavily, so memoize it per engine
+        self._find_merchant = lru_cache(maxsize=4096)(self._find_merchant)
+        self._score_keywords = lru_cache(maxsize=4096)(self._score_keywords)
+        self._match_payment_method = lru_cache(maxsize=4096)(self._match_payment_method)
+        
+        # Number of expenses categorized by merchant alone, without an AI call
+        self._ai_skipped = 0
         
         # Learning patterns cache
         self.user_patterns = {}
@@ -260,6 +360,45 @@ class ExpenseCategorizationEngine:
             "paytm money": {"category": "mutual_funds", "type": "investment", "confidence": 0.95}
         }
     
+    def _build_keyword_automaton(self) -> "ahocorasick.Automaton":
+        """Build a reverse keyword -> category index as an Aho-Corasick automaton"""
+        automaton = ahocorasick.Automaton()
+        for category_rank, (category_id, category) in enumerate(self.categories.items()):
+            for keyword in category.keywords:
+                automaton.add_word(keyword, (keyword, category_id, category_rank))
+        automaton.make_automaton()
+        return automaton
+    
+    def _build_merchant_automaton(self) -> "ahocorasick.Automaton":
+        """Build an Aho-Corasick automaton over all known merchant names"""
+        automaton = ahocorasick.Automaton()
+        for merchant_name in self.indian_merchants:
+            automaton.add_word(merchant_name, merchant_name)
+        automaton.make_automaton()
+        return automaton
+    
+    def _build_payment_automaton(self) -> "ahocorasick.Automaton":
+        """Build an Aho-Corasick automaton mapping payment keywords to method priority"""
+        automaton = ahocorasick.Automaton()
+        for rank, (_, keywords) in enumerate(PAYMENT_METHODS):
+            for keyword in keywords:
+                automaton.add_word(keyword, rank)
+        automaton.make_automaton()
+        return automaton
+    
+    def _find_merchant(self, description_lower: str) -> Optional[str]:
+        """Find the longest (then earliest) known merchant name in a description"""
+        best_match = None
+        best_key = None
+        
+        for end_index, merchant_name in self._merchant_automaton.iter(description_lower):
+            key = (len(merchant_name), -end_index)
+            if best_key is None or key > best_key:
+                best_key = key
+                best_match = merchant_name
+        
+        return best_match
+    
     async def categorize_expense(
         self, 
         description: str, 
@@ -274,53 +413,102 @@ class ExpenseCategorizationEngine:
         expense_id = f"exp_{user_id}_{int(date.timestamp())}"
         
         try:
-            # Method 1: Merchant-based categorization
-            merchant_category, merchant_confidence = self._categorize_by_merchant(description, merchant)
-            
-            # Method 2: Keyword-based categorization
-            keyword_category, keyword_confidence = self._categorize_by_keywords(description)
-            
-            # Method 3: AI-based categorization
-            ai_category, ai_confidence = await self._categorize_by_ai(description, amount)
-            
-            # Method 4: User pattern-based categorization
-            pattern_category, pattern_confidence = await self._categorize_by_user_patterns(description, user_id)
-            
-            # Combine results and select best category
-            final_category, final_confidence, auto_categorized = self._combine_categorization_results([
-                (merchant_category, merchant_confidence, "merchant"),
-                (keyword_category, keyword_confidence, "keyword"),
-                (ai_category, ai_confidence, "ai"),
-                (pattern_category, pattern_confidence, "pattern")
-            ])
-            
-            # Extract additional information
-            extracted_merchant = self._extract_merchant(description)
-            payment_method = self._extract_payment_method(description)
-            
-            categorized_expense = CategorizedExpense(
-                id=expense_id,
-                description=description,
-                amount=amount,
-                category=final_category,
-                subcategory=self._get_subcategory(final_category, description),
-                date=date,
-                confidence_score=final_confidence,
-                auto_categorized=auto_categorized,
-                merchant=extracted_merchant,
-                location=None,  # Could be extracted from description
-                payment_method=payment_method
-            )
+            # Known merchants are reliable on their own, so skip the AI and pattern lookups
+            merchant_result = self._known_merchant_result(description, merchant)
+            if merchant_result:
+                self._ai_skipped += 1
+                return await self._build_categorized_expense(
+                    expense_id, description, amount, user_id, date, *merchant_result, True
+                )
             
-            # Learn from this categorization for future improvements
-            await self._learn_from_categorization(user_id, categorized_expense)
+            # AI-based categorization is resolved up front so batch jobs can supply it
+            ai_result = await self._categorize_by_ai(description, amount)
             
-            return categorized_expense
+            return await self._assemble_categorized_expense(
+                expense_id, description, amount, user_id, date, merchant, ai_result
+            )
             
-        except Exception as e:
-            logger.error(f"Error categorizing expense: {e}")
+        except Exception:
+            logger.exception("Error categorizing expense")
             return self._default_categorized_expense(expense_id, description, amount, date)
     
+    async def _assemble_categorized_expense(
+        self,
+        expense_id: str,
+        description: str,
+        amount: float,
+        user_id: str,
+        date: datetime,
+        merchant: Optional[str],
+        ai_result: Tuple[str, float]
+    ) -> CategorizedExpense:
+        """Combine all categorization signals into a CategorizedExpense"""
+        # Method 1: Merchant-based categorization
+        merchant_category, merchant_confidence = self._categorize_by_merchant(description, merchant)
+        
+        # Method 2: Keyword-based categorization
+        keyword_category, keyword_confidence = self._categorize_by_keywords(description)
+        
+        # Method 3: AI-based categorization (resolved by the caller)
+        ai_category, ai_confidence = ai_result
+        
+        # Method 4: User pattern-based categorization
+        pattern_category, pattern_confidence = await self._categorize_by_user_patterns(description, user_id)
+        
+        # Combine results and select best category
+        final_category, final_confidence, auto_categorized = self._combine_categorization_results([
+            (merchant_category, merchant_confidence, "merchant"),
+            (keyword_category, keyword_confidence, "keyword"),
+            (ai_category, ai_confidence, "ai"),
+            (pattern_category, pattern_confidence, "pattern")
+        ])
+        
+        return await self._build_categorized_expense(
+            expense_id, description, amount, user_id, date, final_category, final_confidence, auto_categorized
+        )
+    
+    async def _build_categorized_expense(
+        self,
+        expense_id: str,
+        description: str,
+        amount: float,
+        user_id: str,
+        date: datetime,
+        category: str,
+        confidence: float,
+        auto_categorized: bool
+    ) -> CategorizedExpense:
+        """Build the CategorizedExpense for a decided category and learn from it"""
+        # Extract additional information
+        extracted_merchant = self._extract_merchant(description)
+        payment_method = self._extract_payment_method(description)
+        
+        categorized_expense = CategorizedExpense(
+            id=expense_id,
+            description=description,
+            amount=amount,
+            category=category,
+            subcategory=self._get_subcategory(category, description),
+            date=date,
+            confidence_score=confidence,
+            auto_categorized=auto_categorized,
+            merchant=extracted_merchant,
+            location=None,  # Could be extracted from description
+            payment_method=payment_method
+        )
+        
+        # Learn from this categorization for future improvements
+        await self._learn_from_categorization(user_id, categorized_expense)
+        
+        return categorized_expense
+    
+    def _known_merchant_result(self, description: str, merchant: str = None) -> Optional[Tuple[str, float]]:
+        """Get the merchant categorization if it is confident enough to skip the other methods"""
+        merchant_category, merchant_confidence = self._categorize_by_merchant(description, merchant)
+        if merchant_confidence >= MERCHANT_SHORTCUT_CONFIDENCE:
+            return merchant_category, merchant_confidence
+        return None
+    
     def _categorize_by_merchant(self, description: str, merchant: str = None) -> Tuple[str, float]:
         """Categorize based on known merchant database"""
         try:
@@ -330,46 +518,47 @@ class ExpenseCategorizationEngine:
                 return merchant_info["category"], merchant_info["confidence"]
             
             # Check description for merchant names
-            description_lower = description.lower()
-            for merchant_name, merchant_info in self.indian_merchants.items():
-                if merchant_name in description_lower:
-                    return merchant_info["category"], merchant_info["confidence"]
+            merchant_name = self._find_merchant(description.lower())
+            if merchant_name:
+                merchant_info = self.indian_merchants[merchant_name]
+                return merchant_info["category"], merchant_info["confidence"]
             
             return "miscellaneous", 0.1
             
-        except Exception as e:
-            logger.error(f"Error in merchant-based categorization: {e}")
+        except Exception:
+            logger.exception("Error in merchant-based categorization")
             return "miscellaneous", 0.1
     
     def _categorize_by_keywords(self, description: str) -> Tuple[str, float]:
         """Categorize based on keyword matching"""
-        try:
-            description_lower = description.lower()
-            best_category = "miscellaneous"
-            best_score = 0.0
-            
-            for category_id, category in self.categories.items():
-                score = 0.0
-                matched_keywords = 0
-                
-                for keyword in category.keywords:
-                    if keyword in description_lower:
-                        matched_keywords += 1
-                        # Longer keywords get higher scores
-                        score += len(keyword) / len(description_lower)
-                
-                # Normalize score based on number of keywords matched
-                if matched_keywords > 0:
-                    final_score = min(0.9, score + (matched_keywords * 0.1))
-                    if final_score > best_score:
-                        best_score = final_score
-                        best_category = category_id
-            
-            return best_category, best_score
-            
-        except Exception as e:
-            logger.error(f"Error in keyword-based categorization: {e}")
-            return "miscellaneous", 0.1
+        return self._score_keywords(description.lower())
+    
+    def _score_keywords(self, description_lower: str) -> Tuple[str, float]:
+        """Score a lowercased description against the keyword index"""
+        # Single pass over the description; each keyword counts once per category
+        matched = {match for _, match in self._keyword_automaton.iter(description_lower)}
+        
+        # category_id -> [rank, matched keywords, matched keyword characters]
+        category_matches = {}
+        for keyword, category_id, category_rank in matched:
+            stats = category_matches.setdefault(category_id, [category_rank, 0, 0])
+            stats[1] += 1
+            stats[2] += len(keyword)
+        
+        best_category = "miscellaneous"
+        best_score = 0.0
+        best_rank = len(self.categories)
+        
+        for category_id, (category_rank, matched_keywords, keyword_chars) in category_matches.items():
+            # Longer keywords get higher scores, normalized by number of keywords matched
+            final_score = min(0.9, keyword_chars / len(description_lower) + (matched_keywords * 0.1))
+            # Ties go to the category defined first, as in the category table
+            if final_score > best_score or (final_score == best_score and category_rank < best_rank):
+                best_score = final_score
+                best_category = category_id
+                best_rank = category_rank
+        
+        return best_category, best_score
     
     async def _categorize_by_ai(self, description: str, amount: float) -> Tuple[str, float]:
         """Use AI to categorize expense"""
@@ -377,58 +566,127 @@ class ExpenseCategorizationEngine:
             if not self.openai_client:
                 return "miscellaneous", 0.1
             
-            # Prepare category options for AI
-            category_options = [cat.name for cat in self.categories.values()]
-            category_descriptions = {cat.id: cat.name for cat in self.categories.values()}
+            cache_key = self._ai_cache_key(description)
+            cached_result = self._get_cached_ai_category(cache_key)
+            if cached_result:
+                return cached_result
             
-            prompt = f"""
-            Categorize this expense transaction for an Indian user:
-            Description: "{description}"
-            Amount: ₹{amount}
+            response = self.openai_client.chat.completions.create(
+                model=AI_CATEGORIZATION_MODEL,
+                messages=self._build_ai_messages(description, amount),
+                response_format=self._ai_response_format,
+                max_tokens=40,
+                temperature=0.1
+            )
             
-            Available categories:
-            {json.dumps(category_descriptions, indent=2)}
+            result = self._parse_ai_category(response.choices[0].message.content)
+            self._cache_ai_category(cache_key, result)
             
-            Consider Indian context, merchants, and spending patterns.
+            return result
             
-            Respond with JSON:
-            {{
-                "category": "category_id",
-                "confidence": 0.0-1.0,
-                "reasoning": "brief explanation"
-            }}
-            """
+        except Exception:
+            logger.exception("Error in AI-based categorization")
+            return "miscellaneous", 0.3
+    
+    def _ai_cache_key(self, description: str) -> str:
+        """Build the AI result cache key from a normalized description"""
+        normalized = DIGITS_PATTERN.sub("", description.lower())
+        normalized = WHITESPACE_PATTERN.sub(" ", normalized).strip()
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+        return f"ai_cat:{digest}"
+    
+    def _get_cached_ai_category(self, cache_key: str) -> Optional[Tuple[str, float]]:
+        """Get a previously cached AI categorization result"""
+        try:
+            if not self.redis_client:
+                return None
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert at categorizing expenses for Indian users. Focus on accuracy and Indian market context."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=150,
-                temperature=0.1
-            )
+            cached_data = self.redis_client.get(cache_key)
+            if not cached_data:
+                return None
             
-            result = json.loads(response.choices[0].message.content.strip())
-            category = result.get("category", "miscellaneous")
-            confidence = float(result.get("confidence", 0.5))
+            category, confidence = json.loads(cached_data)
+            return category, float(confidence)
             
-            # Validate category exists
-            if category not in self.categories:
-                category = "miscellaneous"
-                confidence = 0.3
+        except Exception:
+            logger.exception("Error reading cached AI categorization")
+            return None
+    
+    def _cache_ai_category(self, cache_key: str, result: Tuple[str, float]):
+        """Cache an AI categorization result"""
+        try:
+            if not self.redis_client:
+                return
             
-            return category, confidence
+            self.redis_client.setex(cache_key, AI_CACHE_TTL, json.dumps(list(result)))
             
-        except Exception as e:
-            logger.error(f"Error in AI-based categorization: {e}")
-            return "miscellaneous", 0.3
+        except Exception:
+            logger.exception("Error caching AI categorization")
+    
+    def _build_ai_response_format(self) -> Dict[str, Any]:
+        """Build the JSON schema constraining AI responses to known category ids"""
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "expense_category",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "category": {"type": "string", "enum": list(self.categories)},
+                        "confidence": {"type": "number"}
+                    },
+                    "required": ["category", "confidence"],
+                    "additionalProperties": False
+                }
+            }
+        }
+    
+    def _build_ai_messages(self, description: str, amount: float) -> List[Dict[str, str]]:
+        """Build the chat messages used to categorize an expense with AI"""
+        prompt = f"""
+            Categorize this expense transaction for an Indian user:
+            Description: "{description}"
+            Amount: ₹{amount}
+            
+            Available categories:
+            {self._category_options_json}
+            
+            Consider Indian context, merchants, and spending patterns.
+            Respond with the category id and your confidence (0.0-1.0).
+            """
+        
+        return [
+            {
+                "role": "system",
+                "content": "You are an expert at categorizing expenses for Indian users. Focus on accuracy and Indian market context."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    def _parse_ai_category(self, content: str) -> Tuple[str, float]:
+        """Parse and validate the AI categorization response"""
+        result = json.loads(content.strip())
+        category = result.get("category", "miscellaneous")
+        confidence = float(result.get("confidence", 0.5))
+        
+        # Validate category exists
+        if category not in self.categories:
+            category = "miscellaneous"
+            confidence = 0.3
+        
+        return category, confidence
+    
+    def _user_pattern_keys(self, user_id: str) -> Tuple[str, str]:
+        """Get the Redis keys holding a user's pattern hash and recency index"""
+        return f"user_patterns:{user_id}:map", f"user_patterns:{user_id}:order"
+    
+    def _user_pattern_token_key(self, user_id: str, token: str) -> str:
+        """Get the Redis key of the word -> descriptions index for a user"""
+        return f"user_patterns:{user_id}:token:{token}"
     
     async def _categorize_by_user_patterns(self, description: str, user_id: str) -> Tuple[str, float]:
         """Categorize based on user's historical patterns"""
@@ -436,67 +694,75 @@ class ExpenseCategorizationEngine:
             if not self.redis_client:
                 return "miscellaneous", 0.1
             
-            # Get user patterns from cache
-            patterns_key = f"user_patterns:{user_id}"
-            patterns_data = self.redis_client.get(patterns_key)
+            patterns_key, _ = self._user_pattern_keys(user_id)
+            description_lower = description.lower()
+            
+            query_tokens = _description_tokens(description_lower)
+            if not query_tokens:
+                return "miscellaneous", 0.1
+            
+            # Exact repeat lookup and candidate search share one round trip; a description
+            # can only pass the similarity threshold if it shares at least one word
+            pipe = self.redis_client.pipeline()
+            pipe.hget(patterns_key, description_lower)
+            pipe.sunion([self._user_pattern_token_key(user_id, token) for token in query_tokens])
+            exact_category, candidates = pipe.execute()
+            
+            if exact_category:
+                return exact_category.decode(), 0.8
             
-            if not patterns_data:
+            if not candidates:
                 return "miscellaneous", 0.1
             
-            patterns = json.loads(patterns_data)
+            candidates = list(candidates)
+            candidate_categories = self.redis_client.hmget(patterns_key, candidates)
             
             # Find similar descriptions in user history
-            description_lower = description.lower()
             best_match_category = "miscellaneous"
             best_similarity = 0.0
             
-            for historical_desc, historical_category in patterns.items():
-                similarity = self._calculate_description_similarity(description_lower, historical_desc.lower())
+            for historical_desc, historical_category in zip(candidates, candidate_categories):
+                if historical_category is None:
+                    continue
+                similarity = self._calculate_description_similarity(description_lower, historical_desc.decode())
                 if similarity > best_similarity and similarity > 0.7:  # High threshold for pattern matching
                     best_similarity = similarity
-                    best_match_category = historical_category
+                    best_match_category = historical_category.decode()
             
             confidence = min(0.8, best_similarity)  # Cap confidence for pattern matching
             return best_match_category, confidence
             
-        except Exception as e:
-            logger.error(f"Error in pattern-based categorization: {e}")
+        except Exception:
+            logger.exception("Error in pattern-based categorization")
             return "miscellaneous", 0.1
     
     def _calculate_description_similarity(self, desc1: str, desc2: str) -> float:
         """Calculate similarity between two descriptions"""
         # Simple word overlap similarity
-        words1 = set(desc1.split())
-        words2 = set(desc2.split())
+        words1 = _description_tokens(desc1)
+        words2 = _description_tokens(desc2)
         
         if not words1 or not words2:
             return 0.0
         
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
+        intersection = len(words1 & words2)
+        union = len(words1) + len(words2) - intersection
         
-        return len(intersection) / len(union)
+        return intersection / union
     
     def _combine_categorization_results(self, results: List[Tuple[str, float, str]]) -> Tuple[str, float, bool]:
         """Combine results from different categorization methods"""
-        # Weighted scoring
-        weights = {
-            "merchant": 0.4,
-            "ai": 0.3,
-            "pattern": 0.2,
-            "keyword": 0.1
-        }
-        
-        category_scores = defaultdict(float)
+        # Weighted scoring in integers: confidence in hundredths times weight in percent
+        category_scores = defaultdict(int)
         
         for category, confidence, method in results:
             if category != "miscellaneous":
-                weight = weights.get(method, 0.1)
-                category_scores[category] += confidence * weight
+                weight = CATEGORIZATION_WEIGHTS.get(method, 10)
+                category_scores[category] += round(confidence * 100) * weight
         
         if category_scores:
             best_category = max(category_scores, key=category_scores.get)
-            best_score = category_scores[best_category]
+            best_score = category_scores[best_category] / 10000
             auto_categorized = best_score > 0.6
         else:
             best_category = "miscellaneous"
@@ -527,40 +793,30 @@ class ExpenseCategorizationEngine:
         """Extract merchant name from description"""
         # Look for known merchants first
         description_lower = description.lower()
-        for merchant_name in self.indian_merchants:
-            if merchant_name in description_lower:
-                return merchant_name.title()
+        merchant_name = self._find_merchant(description_lower)
+        if merchant_name:
+            return merchant_name.title()
         
         # Extract merchant patterns (e.g., "Payment to XYZ")
-        patterns = [
-            r"payment to (.+?)(?:\s|$)",
-            r"paid (.+?)(?:\s|$)",
-            r"(.+?)\s+payment",
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, description_lower)
-            if match:
-                return match.group(1).strip().title()
+        match = MERCHANT_PREFIX_PATTERN.search(description_lower) or MERCHANT_SUFFIX_PATTERN.search(description_lower)
+        if match:
+            return match.group(1).strip().title()
         
         return None
     
     def _extract_payment_method(self, description: str) -> Optional[str]:
         """Extract payment method from description"""
-        payment_methods = {
-            "upi": ["upi", "gpay", "phonepe", "paytm", "bhim"],
-            "card": ["card", "visa", "mastercard", "debit", "credit"],
-            "net_banking": ["netbanking", "net banking", "online"],
-            "cash": ["cash", "atm"],
-            "wallet": ["wallet", "paytm wallet", "mobikwik"]
-        }
-        
-        description_lower = description.lower()
-        for method_type, keywords in payment_methods.items():
-            if any(keyword in description_lower for keyword in keywords):
-                return method_type
+        return self._match_payment_method(description.lower())
+    
+    def _match_payment_method(self, description_lower: str) -> Optional[str]:
+        """Match a lowercased description against known payment methods"""
+        # Earlier methods in PAYMENT_METHODS take priority when several match
+        best_rank = None
+        for _, rank in self._payment_automaton.iter(description_lower):
+            if best_rank is None or rank < best_rank:
+                best_rank = rank
         
-        return None
+        return PAYMENT_METHODS[best_rank][0] if best_rank is not None else None
     
     async def _learn_from_categorization(self, user_id: str, expense: CategorizedExpense):
         """Learn from user's categorization for future improvements"""
@@ -568,27 +824,35 @@ class ExpenseCategorizationEngine:
             if not self.redis_client:
                 return
             
-            patterns_key = f"user_patterns:{user_id}"
-            patterns_data = self.redis_client.get(patterns_key)
-            
-            if patterns_data:
-                patterns = json.loads(patterns_data)
-            else:
-                patterns = {}
+            patterns_key, order_key = self._user_pattern_keys(user_id)
+            description_lower = expense.description.lower()
             
-            # Store description -> category mapping
-            patterns[expense.description.lower()] = expense.category
+            # Store description -> category mapping and mark it as most recently seen
+            pipe = self.redis_client.pipeline()
+            pipe.hset(patterns_key, description_lower, expense.category)
+            pipe.zadd(order_key, {description_lower: time.time()})
+            pipe.expire(patterns_key, USER_PATTERNS_TTL)
+            pipe.expire(order_key, USER_PATTERNS_TTL)
+            for token in set(description_lower.split()):
+                token_key = self._user_pattern_token_key(user_id, token)
+                pipe.sadd(token_key, description_lower)
+                pipe.expire(token_key, USER_PATTERNS_TTL)
+            pipe.zcard(order_key)
+            pattern_count = pipe.execute()[-1]
             
             # Keep only recent patterns (limit to 1000 entries)
-            if len(patterns) > 1000:
-                # Remove oldest entries (simple approach)
-                patterns = dict(list(patterns.items())[-1000:])
+            if pattern_count > USER_PATTERNS_LIMIT:
+                oldest = self.redis_client.zpopmin(order_key, pattern_count - USER_PATTERNS_LIMIT)
+                if oldest:
+                    pipe = self.redis_client.pipeline()
+                    pipe.hdel(patterns_key, *(member for member, _ in oldest))
+                    for member, _ in oldest:
+                        for token in set(member.decode().split()):
+                            pipe.srem(self._user_pattern_token_key(user_id, token), member)
+                    pipe.execute()
             
-            # Save back to cache
-            self.redis_client.setex(patterns_key, 86400 * 30, json.dumps(patterns))  # 30 days
-            
-        except Exception as e:
-            logger.error(f"Error learning from categorization: {e}")
+        except Exception:
+            logger.exception("Error learning from categorization")
     
     def _default_categorized_expense(self, expense_id: str, description: str, amount: float, date: datetime) -> CategorizedExpense:
         """Return default categorized expense for error cases"""
@@ -622,42 +886,167 @@ class ExpenseCategorizationEngine:
         
         return categorized_expenses
     
+    async def batch_categorize_expenses_offline(
+        self,
+        expenses: List[Dict[str, Any]],
+        user_id: str,
+        poll_interval: float = 30.0
+    ) -> List[CategorizedExpense]:
+        """Categorize a large set of expenses through the OpenAI Batch API
+        
+        Meant for historical re-categorization runs: all AI requests are
+        uploaded as one JSONL job, which is cheaper than real-time calls but
+        may take up to the 24h completion window to finish.
+        """
+        if not expenses:
+            return []
+        
+        # Expenses from known merchants never need the AI
+        merchant_results = [
+            self._known_merchant_result(expense_data["description"], expense_data.get("merchant"))
+            for expense_data in expenses
+        ]
+        pending = {
+            f"exp_{index}": expense_data
+            for index, (expense_data, merchant_result) in enumerate(zip(expenses, merchant_results))
+            if not merchant_result
+        }
+        ai_results = await self._run_ai_categorization_batch(pending, poll_interval) if pending else {}
+        
+        categorized_expenses = []
+        
+        for index, (expense_data, merchant_result) in enumerate(zip(expenses, merchant_results)):
+            description = expense_data["description"]
+            amount = expense_data["amount"]
+            date = expense_data.get("date") or datetime.now()
+            expense_id = f"exp_{user_id}_{int(date.timestamp())}"
+            
+            try:
+                if merchant_result:
+                    self._ai_skipped += 1
+                    categorized = await self._build_categorized_expense(
+                        expense_id, description, amount, user_id, date, *merchant_result, True
+                    )
+                else:
+                    categorized = await self._assemble_categorized_expense(
+                        expense_id,
+                        description,
+                        amount,
+                        user_id,
+                        date,
+                        expense_data.get("merchant"),
+                        ai_results.get(f"exp_{index}", ("miscellaneous", 0.3))
+                    )
+            except Exception:
+                logger.exception("Error categorizing expense")
+                categorized = self._default_categorized_expense(expense_id, description, amount, date)
+            categorized_expenses.append(categorized)
+        
+        return categorized_expenses
+    
+    async def _run_ai_categorization_batch(
+        self,
+        expenses: Dict[str, Dict[str, Any]],
+        poll_interval: float
+    ) -> Dict[str, Tuple[str, float]]:
+        """Run one OpenAI batch job categorizing the given expenses, keyed by custom id"""
+        ai_results: Dict[str, Tuple[str, float]] = {}
+        
+        try:
+            lines = []
+            for custom_id, expense_data in expenses.items():
+                lines.append(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": AI_CATEGORIZATION_MODEL,
+                        "messages": self._build_ai_messages(expense_data["description"], expense_data["amount"]),
+                        "response_format": self._ai_response_format,
+                        "max_tokens": 40,
+                        "temperature": 0.1
+                    }
+                }))
+            
+            # The OpenAI client is synchronous, so each request runs in a worker thread
+            # to keep the event loop free for the length of the job
+            input_file = await asyncio.to_thread(
+                self.openai_client.files.create,
+                file=("expenses.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch"
+            )
+            batch = await asyncio.to_thread(
+                self.openai_client.batches.create,
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(poll_interval)
+                batch = await asyncio.to_thread(self.openai_client.batches.retrieve, batch.id)
+            
+            if batch.status == "completed" and batch.output_file_id:
+                output_file = await asyncio.to_thread(self.openai_client.files.content, batch.output_file_id)
+                output = output_file.text
+                for line in output.splitlines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    try:
+                        content = record["response"]["body"]["choices"][0]["message"]["content"]
+                        ai_results[record["custom_id"]] = self._parse_ai_category(content)
+                    except (KeyError, IndexError, TypeError, ValueError):
+                        continue
+            else:
+                logger.error("Batch categorization job %s ended with status %s", batch.id, batch.status)
+                
+        except Exception:
+            logger.exception("Error in batch AI categorization")
+        
+        return ai_results
+    
     def get_category_budget_recommendations(self, monthly_income: float) -> Dict[str, float]:
         """Get recommended budget allocation for categories"""
-        recommendations = {}
-        
-        for category_id, category in self.categories.items():
-            recommended_amount = monthly_income * (category.budget_percentage / 100)
-            recommendations[category_id] = {
-                "name": category.name,
-                "recommended_amount": recommended_amount,
-                "percentage": category.budget_percentage,
-                "color": category.color,
-                "icon": category.icon
-            }
+        recommended_amounts = (monthly_income * self._budget_fractions).tolist()
         
-        return recommendations
+        return {
+            category_id: {**template, "recommended_amount": recommended_amount}
+            for (category_id, template), recommended_amount in zip(self._budget_templates, recommended_amounts)
+        }
     
-    def get_spending_insights(self, expenses: List[CategorizedExpense], period_days: int = 30) -> Dict[str, Any]:
+    def get_spending_insights(
+        self,
+        expenses: Union[List[CategorizedExpense], CategorizedExpenseBatch],
+        period_days: int = 30
+    ) -> Dict[str, Any]:
         """Generate spending insights from categorized expenses"""
         try:
-            total_spending = sum(exp.amount for exp in expenses)
-            category_spending = defaultdict(float)
-            category_counts = defaultdict(int)
+            if not isinstance(expenses, CategorizedExpenseBatch):
+                expenses = CategorizedExpenseBatch.from_list(expenses)
+            
+            total_spending = float(expenses.amounts.sum())
             
-            for expense in expenses:
-                category_spending[expense.category] += expense.amount
-                category_counts[expense.category] += 1
+            # Per-category totals and counts indexed by category code
+            num_categories = len(expenses.categories)
+            category_spending = np.bincount(expenses.category_codes, weights=expenses.amounts, minlength=num_categories)
+            category_counts = np.bincount(expenses.category_codes, minlength=num_categories)
             
-            # Top categories by spending
-            top_categories = sorted(category_spending.items(), key=lambda x: x[1], reverse=True)[:5]
+            # Top categories by spending (stable, so ties keep first-seen order)
+            top_categories = [
+                (expenses.categories[code], float(category_spending[code]))
+                for code in np.argsort(-category_spending, kind="stable")[:5]
+            ]
             
             # Calculate averages
             avg_daily_spending = total_spending / period_days if period_days > 0 else 0
             avg_transaction_amount = total_spending / len(expenses) if expenses else 0
             
             # Most frequent categories
-            frequent_categories = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+            frequent_categories = [
+                (expenses.categories[code], int(category_counts[code]))
+                for code in np.argsort(-category_counts, kind="stable")[:3]
+            ]
             
             return {
                 "total_spending": total_spending,
@@ -685,7 +1074,7 @@ class ExpenseCategorizationEngine:
             }
             
         except Exception as e:
-            logger.error(f"Error generating spending insights: {e}")
+            logger.exception("Error generating spending insights")
             return {"error": str(e)}
 
 # Helper functions
@@ -1,16 +1,17 @@
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-import json
-import hashlib
-
-logger = logging.getLogger(__name__)
-import logging
+from sqlalchemy import select, func
+import xxhash
+import time
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
 
 from app.api.v1.schemas import (
     FinancialDataInput,
@@ -25,6 +26,69 @@ from app.services.openai_service import OpenAIService
 
 logger = logging.getLogger(__name__)
 
+# Completed analyses keyed by input data hash, shared across engine instances
+# (the engine is created per request). Entries expire with the market data cache.
+ANALYSIS_CACHE_SIZE = 256
+ANALYSIS_CACHE_TTL = 300  # 5 minutes
+_analysis_cache: "OrderedDict[str, Tuple[float, FinancialAnalysisResponse]]" = OrderedDict()
+
+# Expense categories get process-wide integer codes, so a category keeps the
+# same code across requests. The table is reset if it ever grows past the limit.
+CATEGORY_CODE_LIMIT = 4096
+_category_codes: Dict[str, int] = {}
+_category_names: List[str] = []
+_category_codes_lock = threading.Lock()
+
+def _encode_categories(categories: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Map categories to their stable codes; returns the codes and the code->name table"""
+    with _category_codes_lock:
+        if len(_category_codes) >= CATEGORY_CODE_LIMIT:
+            _category_codes.clear()
+            _category_names.clear()
+        codes = np.empty(len(categories), dtype=np.intp)
+        for i, category in enumerate(categories):
+            code = _category_codes.get(category)
+            if code is None:
+                code = _category_codes[category] = len(_category_names)
+                _category_names.append(category)
+            codes[i] = code
+        return codes, _category_names[:]
+
+# Stored transactions from this many days back count as one month of expenses
+EXPENSE_LOOKBACK_DAYS = 30
+
+# Per-section budget so one stalled upstream cannot hold up the whole response
+ANALYSIS_SECTION_TIMEOUT = 5.0  # seconds
+
+# The ML service holds the loaded models; one instance serves every request
+_shared_ml_service: Optional[MLAnalysisService] = None
+
+def get_shared_ml_service() -> MLAnalysisService:
+    """Get the process-wide ML service, loading its models on first use"""
+    global _shared_ml_service
+    if _shared_ml_service is None:
+        _shared_ml_service = MLAnalysisService()
+    return _shared_ml_service
+
+# Market data and news are cached on the service, so sharing it lets every
+# request reuse the same cache and in-flight fetches
+_shared_market_service: Optional[MarketDataService] = None
+
+def get_shared_market_service() -> MarketDataService:
+    """Get the process-wide market data service"""
+    global _shared_market_service
+    if _shared_market_service is None:
+        _shared_market_service = MarketDataService()
+    return _shared_market_service
+
+@dataclass
+class ExpenseSummary:
+    """Expense aggregates shared by the expense and goal analyses"""
+    expense_df: pd.DataFrame
+    monthly_spending: pd.Series
+    category_spending: pd.Series
+    total: float
+
 class FinancialAnalysisEngine:
     """
     Main Financial Analysis Engine
@@ -33,37 +97,54 @@ class FinancialAnalysisEngine:
     
     def __init__(self, db_session: Optional[AsyncSession] = None):
         self.db = db_session
-        self.ml_service = MLAnalysisService()
-        self.market_service = MarketDataService()
+        self.ml_service = get_shared_ml_service()
+        self.market_service = get_shared_market_service()
         self.openai_service = OpenAIService()
     
     async def analyze_comprehensive(self, data: FinancialDataInput) -> FinancialAnalysisResponse:
         """
         Perform comprehensive financial analysis
         """
-        # Run all analysis components in parallel for efficiency
-        analysis_tasks = await asyncio.gather(
-            self._analyze_expenses(data),
-            self._analyze_portfolio(data),
+        # Identical inputs (e.g. dashboards polling) reuse the previous analysis
+        data_hash = self._compute_data_hash(data)
+        cached = _analysis_cache.get(data_hash)
+        if cached and time.monotonic() - cached[0] < ANALYSIS_CACHE_TTL:
+            _analysis_cache.move_to_end(data_hash)
+            return cached[1]
+        
+        # Expense aggregates are built once and awaited by both sections that need them
+        expense_summary = asyncio.ensure_future(self._summarize_expenses(data))
+        # Likewise one market data fetch serves the portfolio and market risk sections
+        market_data = asyncio.ensure_future(self.market_service.get_current_market_data())
+        
+        # Run all analysis components in parallel for efficiency, each within its time budget
+        sections = (
+            self._analyze_expenses(data, expense_summary),
+            self._analyze_portfolio(data, market_data),
             self._analyze_debt_loans(data),
             self._analyze_insurance(data),
-            self._analyze_goals(data),
+            self._analyze_goals(data, expense_summary),
             self._analyze_credit_cards(data),
-            self._monitor_market_risks(data),
-            self._security_analysis(data),
+            self._monitor_market_risks(data, market_data),
+            self._security_analysis(data, data_hash=data_hash),
+        )
+        analysis_tasks = await asyncio.gather(
+            *(asyncio.wait_for(section, timeout=ANALYSIS_SECTION_TIMEOUT) for section in sections),
             return_exceptions=True
         )
         
         # Handle any exceptions
         results = []
         for i, result in enumerate(analysis_tasks):
-            if isinstance(result, Exception):
+            if isinstance(result, asyncio.TimeoutError):
+                results.append(self._create_default_section(f"Analysis {i} timed out"))
+            elif isinstance(result, Exception):
                 # Create default section for failed analysis
                 results.append(self._create_default_section(f"Analysis {i} failed"))
             else:
                 results.append(result)
         
-        return FinancialAnalysisResponse(
+        response = FinancialAnalysisResponse(
             expense_analysis=results[0],
             portfolio_management=results[1],
             debt_loan_tracking=results[2],
@@ -73,25 +154,42 @@ class FinancialAnalysisEngine:
             automated_monitoring=results[6],
             security=results[7]
         )
+        
+        # Only cache complete analyses so failed sections are retried
+        if not any(isinstance(result, Exception) for result in analysis_tasks):
+            _analysis_cache[data_hash] = (time.monotonic(), response)
+            _analysis_cache.move_to_end(data_hash)
+            while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+                _analysis_cache.popitem(last=False)
+        
+        return response
+    
+    def _compute_data_hash(self, data: FinancialDataInput) -> str:
+        """Fingerprint the input data record by record
+        
+        Used as the analysis cache key and the displayed transaction id, so a
+        fast non-cryptographic 128-bit hash is sufficient. Each record is fed
+        to the hasher as it is visited instead of serializing the whole input.
+        """
+        hasher = xxhash.xxh3_128()
+        for section, value in data:
+            hasher.update(section.encode())
+            records = value if isinstance(value, list) else (value,)
+            for record in records:
+                hasher.update(repr(tuple(record)).encode())
+        return hasher.hexdigest()
     
-    async def _analyze_expenses(self, data: FinancialDataInput) -> AnalysisSection:
+    async def _analyze_expenses(
+        self, data: FinancialDataInput, expense_summary: Optional["asyncio.Future[Optional[ExpenseSummary]]"] = None
+    ) -> AnalysisSection:
         """Analyze spending patterns and detect anomalies"""
         if not data.expenses:
             return self._create_default_section("No expense data available")
         
-        # Convert to DataFrame for analysis
-        expense_df = pd.DataFrame([
-            {
-                'amount': exp.amount,
-                'category': exp.category,
-                'date': exp.date,
-                'merchant': exp.merchant
-            } for exp in data.expenses
-        ])
-        
-        # Calculate spending patterns
-        monthly_spending = expense_df.groupby(expense_df['date'].dt.to_period('M'))['amount'].sum()
-        category_spending = expense_df.groupby('category')['amount'].sum()
+        summary = await self._await_expense_summary(data, expense_summary)
+        expense_df = summary.expense_df
+        monthly_spending = summary.monthly_spending
+        category_spending = summary.category_spending
         
         # Detect anomalies using ML
         anomalies = await self.ml_service.detect_spending_anomalies(expense_df)
@@ -117,8 +215,16 @@ class FinancialAnalysisEngine:
             severity = SeverityLevel.HIGH
         
         # Top spending categories
-        top_categories = category_spending.nlargest(3)
-        suggestions.append(f"Top spending: {', '.join(top_categories.index.tolist())}")
+        # Partial selection of the three largest (earliest wins ties), then order just those
+        category_totals = category_spending.to_numpy()
+        top_idx = np.arange(len(category_totals))
+        if len(top_idx) > 3:
+            third_largest = -np.partition(-category_totals, 2)[2]
+            above = np.flatnonzero(category_totals > third_largest)
+            tied = np.flatnonzero(category_totals == third_largest)[:3 - len(above)]
+            top_idx = np.sort(np.concatenate((above, tied)))
+        top_idx = top_idx[np.argsort(-category_totals[top_idx], kind='stable')]
+        suggestions.append(f"Top spending: {', '.join(category_spending.index[top_idx].tolist())}")
         
         # Budget recommendations
         total_monthly = monthly_spending.mean() if len(monthly_spending) > 0 else 0
@@ -140,30 +246,93 @@ class FinancialAnalysisEngine:
             ]
         )
     
-    async def _analyze_portfolio(self, data: FinancialDataInput) -> AnalysisSection:
+    async def _summarize_expenses(self, data: FinancialDataInput) -> Optional[ExpenseSummary]:
+        """Build the expense aggregates, or None when there are no expenses"""
+        if not data.expenses:
+            return None
+        # pandas/NumPy work runs in a worker thread so the other analyses keep the event loop
+        return await asyncio.to_thread(self._compute_spending_patterns, data)
+    
+    async def _await_expense_summary(
+        self, data: FinancialDataInput, expense_summary: Optional["asyncio.Future[Optional[ExpenseSummary]]"]
+    ) -> Optional[ExpenseSummary]:
+        """Wait for a shared expense summary, or build one when none was passed in"""
+        if expense_summary is None:
+            return await self._summarize_expenses(data)
+        # Shield so a section timing out does not cancel the summary for the other section
+        return await asyncio.shield(expense_summary)
+    
+    async def _await_market_data(self, market_data: Optional["asyncio.Future[Dict[str, Any]]"]) -> Dict[str, Any]:
+        """Wait for a shared market data fetch, or fetch it when none was passed in"""
+        if market_data is None:
+            return await self.market_service.get_current_market_data()
+        return await asyncio.shield(market_data)
+    
+    def _compute_spending_patterns(self, data: FinancialDataInput) -> ExpenseSummary:
+        """Build the expense DataFrame and its monthly and per-category totals"""
+        # Convert to DataFrame for analysis, one typed column at a time
+        num_expenses = len(data.expenses)
+        expense_df = pd.DataFrame({
+            'amount': np.fromiter((exp.amount for exp in data.expenses), dtype=np.float64, count=num_expenses),
+            # Categories and merchants repeat heavily, so store them dictionary-encoded
+            'category': pd.Categorical([exp.category for exp in data.expenses]),
+            'date': pd.to_datetime([exp.date for exp in data.expenses]),
+            'merchant': pd.Categorical([exp.merchant for exp in data.expenses])
+        })
+        
+        # Calculate spending patterns: monthly and per-category totals from integer codes
+        amounts = expense_df['amount'].to_numpy()
+        month_codes, months = pd.factorize(expense_df['date'].dt.to_period('M'), sort=True)
+        # Only the distinct categories go through the shared code table
+        category_column = expense_df['category'].cat
+        stable_codes, category_names = _encode_categories(category_column.categories.tolist())
+        category_codes = stable_codes[category_column.codes]
+        monthly_spending = pd.Series(
+            np.bincount(month_codes, weights=amounts, minlength=len(months)), index=months
+        )
+        category_totals = np.bincount(category_codes, weights=amounts)
+        present = np.flatnonzero(np.bincount(category_codes))
+        category_spending = pd.Series(
+            category_totals[present], index=[category_names[code] for code in present]
+        ).sort_index()
+        
+        return ExpenseSummary(
+            expense_df=expense_df,
+            monthly_spending=monthly_spending,
+            category_spending=category_spending,
+            total=float(amounts.sum())
+        )
+    
+    async def _analyze_portfolio(
+        self, data: FinancialDataInput, market_data: Optional["asyncio.Future[Dict[str, Any]]"] = None
+    ) -> AnalysisSection:
         """Analyze investment portfolio performance and allocation"""
         if not data.investments:
             return self._create_default_section("No investment data available")
         
         # Calculate portfolio metrics
-        total_value = sum(inv.total_value for inv in data.investments)
-        total_gain_loss = sum(inv.gain_loss for inv in data.investments)
+        num_investments = len(data.investments)
+        values = np.fromiter((inv.total_value for inv in data.investments), dtype=np.float64, count=num_investments)
+        gains = np.fromiter((inv.gain_loss for inv in data.investments), dtype=np.float64, count=num_investments)
+        total_value = float(values.sum())
+        total_gain_loss = float(gains.sum())
         portfolio_return = (total_gain_loss / (total_value - total_gain_loss)) * 100 if total_value > total_gain_loss else 0
         
         # Asset allocation analysis
-        allocation = {}
-        for inv in data.investments:
-            allocation[inv.asset_type] = allocation.get(inv.asset_type, 0) + inv.total_value
-        
-        allocation_pct = {k: (v/total_value)*100 for k, v in allocation.items()}
+        # factorize keeps asset types in first-seen order, like the dict it feeds
+        type_codes, asset_types = pd.factorize(
+            np.fromiter((inv.asset_type for inv in data.investments), dtype=object, count=num_investments)
+        )
+        allocation = np.bincount(type_codes, weights=values, minlength=len(asset_types))
+        allocation_shares = allocation / total_value * 100
+        allocation_pct = dict(zip(asset_types, allocation_shares.tolist()))
         
         # Risk analysis
         risk_score = await self.ml_service.calculate_portfolio_risk(data.investments)
         
         # Market correlation
-        market_data = await self.market_service.get_current_market_data()
         correlation_analysis = await self.ml_service.analyze_market_correlation(
-            data.investments, market_data
+            data.investments, await self._await_market_data(market_data)
         )
         
         suggestions = []
@@ -176,9 +345,10 @@ class FinancialAnalysisEngine:
             severity = SeverityLevel.MEDIUM
         
         # Concentration risk
-        max_allocation = max(allocation_pct.values())
+        top_asset = int(np.argmax(allocation_shares))
+        max_allocation = float(allocation_shares[top_asset])
         if max_allocation > 60:
-            suggestions.append(f"High concentration in {max(allocation_pct, key=allocation_pct.get)} ({max_allocation:.1f}%) - consider rebalancing")
+            suggestions.append(f"High concentration in {asset_types[top_asset]} ({max_allocation:.1f}%) - consider rebalancing")
             severity = SeverityLevel.HIGH
         
         # Performance insights
@@ -213,9 +383,13 @@ class FinancialAnalysisEngine:
             return self._create_default_section("No loan data available")
         
         # Calculate debt metrics
-        total_debt = sum(loan.outstanding_balance for loan in data.loans)
-        monthly_payments = sum(loan.monthly_payment for loan in data.loans)
-        weighted_avg_rate = sum(loan.interest_rate * loan.outstanding_balance for loan in data.loans) / total_debt
+        num_loans = len(data.loans)
+        balances = np.fromiter((loan.outstanding_balance for loan in data.loans), dtype=np.float64, count=num_loans)
+        payments = np.fromiter((loan.monthly_payment for loan in data.loans), dtype=np.float64, count=num_loans)
+        rates = np.fromiter((loan.interest_rate for loan in data.loans), dtype=np.float64, count=num_loans)
+        total_debt = float(balances.sum())
+        monthly_payments = float(payments.sum())
+        weighted_avg_rate = float(rates @ balances) / total_debt
         
         # Debt-to-income ratio
         debt_to_income = (monthly_payments * 12) / data.user.annual_income * 100
@@ -276,8 +450,15 @@ class FinancialAnalysisEngine:
             )
         
         # Coverage analysis
-        life_coverage = sum(ins.coverage_amount for ins in data.insurance if ins.insurance_type == "life")
-        annual_premiums = sum(ins.premium * (12 if ins.premium_frequency == "monthly" else 1) for ins in data.insurance)
+        num_policies = len(data.insurance)
+        coverages = np.fromiter((ins.coverage_amount for ins in data.insurance), dtype=np.float64, count=num_policies)
+        premiums = np.fromiter((ins.premium for ins in data.insurance), dtype=np.float64, count=num_policies)
+        is_life = np.fromiter((ins.insurance_type == "life" for ins in data.insurance), dtype=bool, count=num_policies)
+        is_monthly = np.fromiter((ins.premium_frequency == "monthly" for ins in data.insurance), dtype=bool, count=num_policies)
+        expiries = np.array([ins.expiry_date for ins in data.insurance], dtype="datetime64[us]")
+        total_coverage = float(coverages.sum())
+        life_coverage = float(coverages[is_life].sum())
+        annual_premiums = float((premiums * np.where(is_monthly, 12, 1)).sum())
         
         # Recommended life insurance (10x annual income)
         recommended_life = data.user.annual_income * 10
@@ -299,9 +480,10 @@ class FinancialAnalysisEngine:
             severity = max(severity, SeverityLevel.MEDIUM)
         
         # Expiring policies
-        expiring_soon = [ins for ins in data.insurance if ins.expiry_date < datetime.now() + timedelta(days=30)]
+        expiry_cutoff = np.datetime64(datetime.now() + timedelta(days=30), "us")
+        expiring_soon = int((expiries < expiry_cutoff).sum())
         if expiring_soon:
-            suggestions.append(f"{len(expiring_soon)} policies expiring within 30 days")
+            suggestions.append(f"{expiring_soon} policies expiring within 30 days")
             severity = SeverityLevel.HIGH
         
         # Coverage gaps
@@ -313,7 +495,7 @@ class FinancialAnalysisEngine:
         
         return AnalysisSection(
             actionable_suggestions=suggestions,
-            rationale=f"Total coverage: ${sum(ins.coverage_amount for ins in data.insurance):,.0f}, "
+            rationale=f"Total coverage: ${total_coverage:,.0f}, "
                      f"Annual premiums: ${annual_premiums:,.0f} ({premium_percentage:.1f}% of income)",
             severity_level=severity,
             confidence=confidence,
@@ -324,26 +506,34 @@ class FinancialAnalysisEngine:
             ]
         )
     
-    async def _analyze_goals(self, data: FinancialDataInput) -> AnalysisSection:
+    async def _analyze_goals(
+        self, data: FinancialDataInput, expense_summary: Optional["asyncio.Future[Optional[ExpenseSummary]]"] = None
+    ) -> AnalysisSection:
         """Analyze financial goals and feasibility"""
         if not data.goals:
             return self._create_default_section("No financial goals defined")
         
-        # Calculate required savings for each goal
-        goal_analysis = []
-        for goal in data.goals:
-            months_remaining = max(1, (goal.target_date - datetime.now()).days / 30)
-            required_monthly = (goal.target_amount - goal.current_amount) / months_remaining
-            goal_analysis.append({
-                'goal': goal,
-                'months_remaining': months_remaining,
-                'required_monthly': required_monthly
-            })
+        # Calculate required savings for each goal against a single "now"
+        num_goals = len(data.goals)
+        now = np.datetime64(datetime.now(), "us")
+        target_dates = np.array([goal.target_date for goal in data.goals], dtype="datetime64[us]")
+        targets = np.fromiter((goal.target_amount for goal in data.goals), dtype=np.float64, count=num_goals)
+        current = np.fromiter((goal.current_amount for goal in data.goals), dtype=np.float64, count=num_goals)
+        # Whole days remaining, floored like timedelta.days
+        days_remaining = (target_dates - now) // np.timedelta64(1, "D")
+        months_remaining = np.maximum(1, days_remaining / 30)
+        required_monthly = (targets - current) / months_remaining
         
         # Total monthly savings needed
-        total_monthly_needed = sum(analysis['required_monthly'] for analysis in goal_analysis)
+        total_monthly_needed = float(required_monthly.sum())
         available_income = data.user.annual_income / 12
-        current_expenses = sum(exp.amount for exp in data.expenses) if data.expenses else available_income * 0.7
+        summary = await self._await_expense_summary(data, expense_summary)
+        if summary:
+            current_expenses = summary.total
+        else:
+            # Without expenses in the request, fall back to the stored transactions
+            stored = await self._aggregate_expenses(data.user.user_id)
+            current_expenses = stored[0] if stored and stored[1] else available_income * 0.7
         available_for_savings = available_income - current_expenses
         
         # Feasibility analysis
@@ -367,10 +557,9 @@ class FinancialAnalysisEngine:
             suggestions.append("Too many high-priority goals - consider prioritizing")
         
         # Goal-specific insights
-        for analysis in goal_analysis[:3]:  # Top 3 goals
-            goal = analysis['goal']
-            if analysis['required_monthly'] > available_income * 0.3:
-                suggestions.append(f"{goal.name} requires ${analysis['required_monthly']:,.0f}/month - may need timeline extension")
+        for goal, goal_required in zip(data.goals[:3], required_monthly[:3].tolist()):  # Top 3 goals
+            if goal_required > available_income * 0.3:
+                suggestions.append(f"{goal.name} requires ${goal_required:,.0f}/month - may need timeline extension")
         
         return AnalysisSection(
             actionable_suggestions=suggestions,
@@ -392,15 +581,17 @@ class FinancialAnalysisEngine:
             return self._create_default_section("No credit card data available")
         
         # Calculate metrics
-        total_balance = sum(card.current_balance for card in data.credit_cards)
-        total_limit = sum(card.credit_limit for card in data.credit_cards)
+        num_cards = len(data.credit_cards)
+        balances = np.fromiter((card.current_balance for card in data.credit_cards), dtype=np.float64, count=num_cards)
+        limits = np.fromiter((card.credit_limit for card in data.credit_cards), dtype=np.float64, count=num_cards)
+        total_balance = float(balances.sum())
+        total_limit = float(limits.sum())
         overall_utilization = (total_balance / total_limit) * 100 if total_limit > 0 else 0
         
         # Interest calculations
-        monthly_interest = sum(
-            card.current_balance * (card.apr / 100 / 12) 
-            for card in data.credit_cards if card.current_balance > 0
-        )
+        aprs = np.fromiter((card.apr for card in data.credit_cards), dtype=np.float64, count=num_cards)
+        carried = balances > 0
+        monthly_interest = float((balances[carried] * (aprs[carried] / 100 / 12)).sum())
         
         suggestions = []
         severity = SeverityLevel.LOW
@@ -444,11 +635,13 @@ class FinancialAnalysisEngine:
             ]
         )
     
-    async def _monitor_market_risks(self, data: FinancialDataInput) -> AnalysisSection:
+    async def _monitor_market_risks(
+        self, data: FinancialDataInput, market_data: Optional["asyncio.Future[Dict[str, Any]]"] = None
+    ) -> AnalysisSection:
         """Monitor global market risks and provide alerts"""
         try:
             # Get current market data
-            market_data = await self.market_service.get_current_market_data()
+            market_data = await self._await_market_data(market_data)
             news_analysis = await self.market_service.analyze_market_news()
             
             # Risk assessment
@@ -509,12 +702,12 @@ class FinancialAnalysisEngine:
                 alternatives=["Check financial news manually", "Consult with financial advisor"]
             )
     
-    async def _security_analysis(self, data: FinancialDataInput) -> AnalysisSection:
+    async def _security_analysis(self, data: FinancialDataInput, data_hash: Optional[str] = None) -> AnalysisSection:
         """Analyze security and compliance aspects"""
         
         # Generate data hash for blockchain logging
-        data_str = json.dumps(data.dict(), sort_keys=True, default=str)
-        data_hash = hashlib.sha256(data_str.encode()).hexdigest()
+        if data_hash is None:
+            data_hash = self._compute_data_hash(data)
         
         # Security checks
         fraud_indicators = await self.ml_service.detect_fraud_indicators(data.expenses)
@@ -550,6 +743,36 @@ class FinancialAnalysisEngine:
             ]
         )
     
+    async def _aggregate_expenses(self, user_id: str) -> Optional[Tuple[float, int]]:
+        """Total and count of a user's expenses over the last month, summed in the database"""
+        if not self.db:
+            return None
+        
+        try:
+            user_uuid = uuid.UUID(str(user_id))
+        except ValueError:
+            # Demo and anonymous users have no stored transactions
+            return None
+        
+        since = datetime.now() - timedelta(days=EXPENSE_LOOKBACK_DAYS)
+        try:
+            result = await self.db.execute(
+                select(
+                    func.coalesce(func.sum(Transaction.amount), 0),
+                    func.count(Transaction.id)
+                ).where(
+                    Transaction.user_id == user_uuid,
+                    Transaction.amount < 0,  # Expenses are negative
+                    Transaction.transaction_date >= since
+                )
+            )
+            total, count = result.one()
+            return abs(float(total)), int(count)
+        except Exception as e:
+            logger.error("Error aggregating expenses for user %s: %s", user_id, e)
+            await self.db.rollback()
+            return None
+    
     def _create_default_section(self, message: str) -> AnalysisSection:
         """Create a default analysis section"""
         return AnalysisSection(
@@ -568,11 +791,11 @@ class FinancialAnalysisEngine:
         try:
             # Note: Insight model would store comprehensive analysis results
             # For now, returning the result object directly
-            logger.info(f"Generated comprehensive financial analysis for user {user_id}")
+            logger.info("Generated comprehensive financial analysis for user %s", user_id)
             return result
             
         except Exception as e:
-            logger.error(f"Error processing insights: {str(e)}")
+            logger.error("Error processing insights: %s", e)
             if self.db:
                 await self.db.rollback()
             return result
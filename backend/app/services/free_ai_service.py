@@ -3,304 +3,1167 @@ Free AI Service for FinVoice Chatbot
 Integrates multiple free AI APIs for financial advice
 """
 
-import json
+import hashlib
 import logging
-import requests
 import asyncio
+import ahocorasick
+import bisect
+import functools
+import itertools
+import operator
 import random
-from typing import Dict, List, Any, Optional
+import re
+import string
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Sequence, Set, Tuple
 from datetime import datetime
-import aiohttp
+from decouple import config
+import orjson
+import redis.asyncio as aioredis
+
+if TYPE_CHECKING:
+    # Imported lazily at runtime; only the Hugging Face path needs it
+    import aiohttp
 
 logger = logging.getLogger(__name__)
 
+# Finished advice keyed by normalized query and the profile fields the advice uses.
+# Redis shares it across workers; a short-lived in-process tier in front saves the round trip.
+ADVICE_CACHE_SIZE = 4096
+ADVICE_CACHE_TTL = 900  # 15 minutes
+ADVICE_LOCAL_TTL = 60  # in-process tier when Redis is available
+
+def _keyword_pattern(*keywords: str) -> "re.Pattern[str]":
+    """Compile keywords into one alternation, matched as substrings like `word in text`"""
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords))
+
+# Query keyword groups, each checked with a single regex scan of the lowercased query
+KW_EDUCATION = _keyword_pattern('child', 'education', 'school', 'college')
+KW_PROPERTY = _keyword_pattern('house', 'home', 'property', 'real estate')
+KW_RETIREMENT = _keyword_pattern('retirement', 'pension', 'old age')
+KW_TAX = _keyword_pattern('tax', '80c', 'deduction', 'save tax')
+KW_EMERGENCY = _keyword_pattern('emergency', 'fund', 'crisis')
+KW_INVESTMENT = _keyword_pattern('invest', 'investment', 'mutual fund', 'stocks', 'portfolio')
+KW_SAVINGS = _keyword_pattern('save', 'saving', 'deposit', 'fd')
+KW_EXPENSES = _keyword_pattern('expense', 'spending', 'budget', 'cost', 'reduce')
+KW_GOALS = _keyword_pattern('goal', 'plan', 'target', 'future')
+
+# General advice categories, in priority order
+SMART_RESPONSE_CATEGORIES = (
+    (KW_INVESTMENT, "investment"),
+    (KW_SAVINGS, "savings"),
+    (KW_EXPENSES, "expenses"),
+    (KW_GOALS, "goals"),
+)
+
+MARKET_INSIGHTS = (
+    (_keyword_pattern('invest', 'mutual fund', 'equity', 'stocks'),
+     "Current market shows strong fundamentals in large-cap stocks. Nifty 50 has delivered consistent returns. SIP remains the best strategy for volatility management."),
+    (_keyword_pattern('debt', 'bonds', 'fixed'),
+     "Interest rates are stabilizing, making this a good time for debt investments. Government bonds offer 7-8% returns with safety."),
+    (_keyword_pattern('gold', 'commodity'),
+     "Gold prices are consolidating. Consider 5-10% allocation for portfolio diversification. Gold ETFs are more convenient than physical gold."),
+    (_keyword_pattern('real estate', 'property', 'house'),
+     "Real estate prices are showing steady growth in major cities. Home loan rates are attractive at 8-9%. Consider ready-to-move properties for immediate possession."),
+)
+
+# Keyword flags for the fallback advice helpers, matched as substrings of the lowercased query
+QUERY_FLAG_WORDS = (
+    'invest', 'mutual fund', 'sip', 'stocks', 'save', 'emergency', 'fd', 'deposit',
+    'goal', 'plan', 'house', 'car', 'retirement', 'expense', 'budget', 'spending',
+    'reduce', 'tax', '80c', 'deduction', 'insurance', 'term', 'health', 'child',
+)
+QUERY_FLAG = {word: 1 << bit for bit, word in enumerate(QUERY_FLAG_WORDS)}
+
+def _query_flags(*words: str) -> int:
+    """Bitmask matching any of the given keywords"""
+    return functools.reduce(operator.or_, (QUERY_FLAG[word] for word in words))
+
+# A match of one keyword also implies every keyword contained in it
+_QUERY_FLAG_MATCH = {
+    word: _query_flags(*(other for other in QUERY_FLAG_WORDS if other in word))
+    for word in QUERY_FLAG_WORDS
+}
+# Zero-width lookahead finds overlapping keywords, longest first at each position
+_QUERY_FLAG_RE = re.compile(
+    "(?=(" + "|".join(re.escape(word) for word in sorted(QUERY_FLAG_WORDS, key=len, reverse=True)) + "))"
+)
+
+TAX = QUERY_FLAG['tax']
+RETIREMENT = QUERY_FLAG['retirement']
+EMERGENCY = QUERY_FLAG['emergency']
+INVEST = QUERY_FLAG['invest']
+GOAL = QUERY_FLAG['goal']
+CHILD = QUERY_FLAG['child']
+HOUSE = QUERY_FLAG['house']
+
+# Topic groups for _get_template_advice, in priority order
+TEMPLATE_INVESTMENT = _query_flags('invest', 'mutual fund', 'sip', 'stocks')
+TEMPLATE_SAVINGS = _query_flags('save', 'emergency', 'fd', 'deposit')
+TEMPLATE_GOALS = _query_flags('goal', 'plan', 'house', 'car', 'retirement')
+TEMPLATE_EXPENSES = _query_flags('expense', 'budget', 'spending', 'reduce')
+TEMPLATE_TAX = _query_flags('tax', '80c', 'deduction')
+TEMPLATE_INSURANCE = _query_flags('insurance', 'term', 'health')
+
+@dataclass(slots=True)
+class QueryFeatures:
+    """A query analyzed once and shared by every advice helper"""
+    raw: str
+    lower: str
+    category: str
+    flags: int
+
+    @classmethod
+    def from_query(cls, query: str) -> "QueryFeatures":
+        lower = query.lower()
+        flags = 0
+        for match in _QUERY_FLAG_RE.finditer(lower):
+            flags |= _QUERY_FLAG_MATCH[match.group(1)]
+        category = next(
+            (name for keywords, name in SMART_RESPONSE_CATEGORIES if keywords.search(lower)),
+            "general"
+        )
+        return cls(raw=query, lower=lower, category=category, flags=flags)
+
+# Conversational and financial intents for the enhanced advice router, in priority order
+ENHANCED_INTENTS = (
+    ("greeting", ('hello', 'hi', 'hey', 'good morning', 'good evening')),
+    ("capability", ('how are you', 'what can you do', 'help me')),
+    ("appreciation", ('thank', 'thanks', 'great', 'awesome')),
+    ("invest", ('invest', 'sip', 'mutual fund', 'portfolio')),
+    ("save", ('save', 'emergency', 'fd')),
+    ("goal", ('goal', 'education', 'house', 'retirement')),
+    ("expense", ('expense', 'budget', 'reduce', 'spending')),
+)
+# Keywords that also tag a sub-intent of their own, read by the enhanced router
+# and the specialized advice generators
+ENHANCED_SUB_INTENTS = {
+    'house': "house",
+    'girl': "girl_child",
+    'daughter': "girl_child",
+    '10 year': "long_term",
+    '15 year': "long_term",
+    'long term': "long_term",
+}
+
+def _build_intent_automaton() -> "ahocorasick.Automaton":
+    """Build an Aho-Corasick automaton mapping each keyword to the intent tags it implies"""
+    keyword_tags: Dict[str, Tuple[str, ...]] = {}
+    for intent, keywords in ENHANCED_INTENTS:
+        for keyword in keywords:
+            keyword_tags[keyword] = keyword_tags.get(keyword, ()) + (intent,)
+    for keyword, tag in ENHANCED_SUB_INTENTS.items():
+        keyword_tags[keyword] = keyword_tags.get(keyword, ()) + (tag,)
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, tags in keyword_tags.items():
+        automaton.add_word(keyword, tags)
+    automaton.make_automaton()
+    return automaton
+
+INTENT_AUTOMATON = _build_intent_automaton()
+
+# Punctuation becomes whitespace so phrases like 'mutual-fund' still match 'mutual fund'
+PUNCTUATION_TO_SPACE = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+def _query_intents(query: str) -> Set[str]:
+    """Every intent tag whose keywords occur in the query, found in a single pass"""
+    normalized = " ".join(query.lower().translate(PUNCTUATION_TO_SPACE).split())
+    intents: Set[str] = set()
+    for _, tags in INTENT_AUTOMATON.iter(normalized):
+        intents.update(tags)
+    return intents
+
+# Financial intents of the enhanced router, in priority order
+ENHANCED_FINANCIAL_INTENTS = ("invest", "save", "goal", "expense")
+
+# Static API, template and market reference data, shared by every instance
+API_ENDPOINTS = {
+    "huggingface": {
+        "base_url": "https://api-inference.huggingface.co/models",
+        "models": {
+            "conversation": "microsoft/DialoGPT-medium",
+            "text_generation": "gpt2",
+            "financial_bert": "ProsusAI/finbert",
+            "sentiment": "cardiffnlp/twitter-roberta-base-sentiment-latest"
+        }
+    },
+    "ollama_demo": {
+        "base_url": "https://ollama.ai/api",
+        "models": ("llama2", "mistral", "codellama")
+    },
+    "groq": {
+        "base_url": "https://api.groq.com/openai/v1/chat/completions",
+        "model": "llama2-70b-4096"
+    }
+}
+
+FINANCIAL_TEMPLATES = {
+    "investment": (
+        "For investment planning, I recommend a diversified approach based on your profile.",
+        "Let's build a solid investment strategy tailored to your goals and risk tolerance.",
+        "Investment success comes from consistent planning and regular review.",
+        "Based on current market conditions, here are personalized investment options for you."
+    ),
+    "savings": (
+        "Building a strong savings foundation is crucial for your financial security.",
+        "Let me help you optimize your savings strategy with current interest rates.",
+        "Emergency fund planning is essential - let's calculate the right amount for you.",
+        "Smart savings allocation can significantly boost your financial growth."
+    ),
+    "expenses": (
+        "Expense optimization is key to increasing your investment capacity.",
+        "Let's analyze your spending patterns and find improvement opportunities.",
+        "Budget management becomes easier with the right tracking methods.",
+        "Smart expense planning can free up significant funds for your goals."
+    ),
+    "goals": (
+        "Goal-based financial planning ensures you stay on track for success.",
+        "Let's create a roadmap to achieve your financial dreams systematically.",
+        "Every financial goal needs a specific plan with timelines and amounts.",
+        "I'll help you prioritize and plan for multiple financial objectives."
+    ),
+    "tax": (
+        "Tax optimization can save you thousands while building wealth.",
+        "Let's maximize your tax benefits with smart investment choices.",
+        "Strategic tax planning throughout the year yields better results.",
+        "I'll show you how to legally minimize taxes while growing wealth."
+    ),
+    "retirement": (
+        "Retirement planning requires starting early for maximum benefit.",
+        "Let's calculate your retirement corpus and create an action plan.",
+        "Multiple retirement instruments can optimize your post-work life.",
+        "Early retirement planning gives you financial freedom and security."
+    )
+}
+
+INDIAN_CONTEXT = {
+    "instruments": {
+        "equity": ("Nifty 50 ETF", "Large Cap Mutual Funds", "Mid Cap Funds", "Small Cap Funds", "Sectoral ETFs"),
+        "debt": ("PPF", "NSC", "Government Bonds", "Corporate Bonds", "FDs", "GILT Funds"),
+        "tax_saving": ("ELSS", "PPF", "NSC", "Tax Saver FD", "NPS", "Life Insurance"),
+        "insurance": ("Term Life Insurance", "Health Insurance", "Critical Illness", "Motor Insurance"),
+        "real_estate": ("Residential Property", "Commercial Property", "REITs", "Land Investment"),
+        "alternatives": ("Gold ETF", "Silver ETF", "Commodities", "International Funds")
+    },
+    "returns": {
+        "equity_long_term": "12-15% annually (5+ years)",
+        "equity_short_term": "Variable (high volatility)",
+        "debt": "6-8% annually",
+        "fd": "6-7% annually",
+        "ppf": "7-8% annually (tax-free)",
+        "real_estate": "8-10% annually",
+        "gold": "6-8% annually"
+    },
+    "current_market": {
+        "nifty_50": "Strong fundamentals, good for long-term",
+        "mid_cap": "Higher growth potential, moderate risk",
+        "small_cap": "High risk-reward, for experienced investors",
+        "debt_funds": "Stable returns, good for conservative investors"
+    },
+    "tax_brackets_2024": (
+        {"range": "₹0 - ₹3L", "rate": "0%", "advice": "Focus on wealth building"},
+        {"range": "₹3L - ₹7L", "rate": "5%", "advice": "Start tax planning"},
+        {"range": "₹7L - ₹10L", "rate": "10%", "advice": "Optimize 80C investments"},
+        {"range": "₹10L - ₹12L", "rate": "15%", "advice": "Consider NPS for extra benefits"},
+        {"range": "₹12L - ₹15L", "rate": "20%", "advice": "Comprehensive tax strategy needed"},
+        {"range": "Above ₹15L", "rate": "30%", "advice": "Advanced tax optimization essential"}
+    )
+}
+
+# Market context attached to every advice response; shared, so never mutate it.
+# A plain dict rather than a MappingProxyType so responses stay JSON-serializable.
+MARKET_CONTEXT = {
+    "equity_outlook": "Positive long-term outlook with periodic volatility",
+    "interest_rates": "Stable to declining trend, favorable for borrowers",
+    "inflation": "Controlled at 5-6%, manageable for financial planning",
+    "best_sectors": "Technology, Banking, Healthcare showing strong fundamentals"
+}
+
+DEFAULT_TIPS = ("Start tracking expenses", "Build emergency fund", "Begin SIP investments")
+
+# Quick tips by category for get_quick_tips
+QUICK_TIPS = {
+    "investment": (
+        "Start SIP with just ₹500/month",
+        "Diversify across large, mid, and small cap funds",
+        "Stay invested for minimum 5 years",
+        "Don't time the market, invest regularly"
+    ),
+    "savings": (
+        "Automate savings on salary day",
+        "Keep emergency fund separate from investments",
+        "Use high-yield savings accounts",
+        "Save before you spend, not spend then save"
+    ),
+    "tax": (
+        "Invest ₹1.5L in 80C instruments",
+        "Consider NPS for extra ₹50K deduction",
+        "Plan investments by December",
+        "Keep all investment proofs organized"
+    ),
+    "budget": (
+        "Use 50-30-20 rule for allocation",
+        "Track every expense for one month",
+        "Set category-wise spending limits",
+        "Review and adjust monthly"
+    )
+}
+
+DEFAULT_QUICK_TIPS = (
+    "Start your financial journey today",
+    "Consistency beats timing in investments",
+    "Emergency fund is your financial safety net",
+    "Invest regularly, review quarterly"
+)
+
+# Portfolio insight bands: (low, high, message below low, message above high)
+PORTFOLIO_VALUE_INSIGHTS = (
+    100000, 1000000,
+    "Consider increasing your portfolio value through regular SIPs.",
+    "Good portfolio size! Focus on rebalancing and diversification."
+)
+PORTFOLIO_HOLDINGS_INSIGHTS = (
+    3, 10,
+    "Diversify your portfolio across more funds or sectors.",
+    "Consider consolidating holdings to reduce complexity."
+)
+PORTFOLIO_CHANGE_INSIGHTS = (
+    -2, 2,
+    "Market volatility is normal. Stick to your long-term plan.",
+    "Strong performance today! Stay disciplined and avoid overconfidence."
+)
+
+def _band_insight(value: float, bands: Tuple[float, float, str, str]) -> Optional[str]:
+    """Insight for a value below or above its band, None inside it"""
+    low, high, below, above = bands
+    if value < low:
+        return below
+    if value > high:
+        return above
+    return None
+
+EXPENSE_TRACKING_INSIGHTS = (
+    "Track daily expenses using apps to identify savings opportunities. "
+    "Review recurring subscriptions and cancel unused ones."
+)
+
+# Personalized tips by monthly income: below ₹30K, below ₹1L, above
+TIPS_BY_INCOME = (
+    ("Use free investment apps for small SIPs",
+     "Maximize employer benefits (PF, insurance)",
+     "Focus on skill development for income growth"),
+    ("Automate investments for discipline",
+     "Review and increase SIP annually",
+     "Consider term insurance for family protection"),
+    ("Explore tax-efficient investment strategies",
+     "Consider professional financial planning",
+     "Look into alternative investments for diversification"),
+)
+
+# Income-tier advice for _add_contextual_advice: a general sentence per tier plus
+# category-specific additions, indexed by _income_bucket
+INCOME_TIER_ADVICE = (
+    ("With your current income, focus on building emergency fund first with simple savings accounts or FDs.",
+     {"investment": "Start with ₹500/month SIP in large-cap funds once emergency fund is ready."}),
+    ("Consider starting SIPs of ₹2000-3000/month in large-cap mutual funds for long-term wealth creation.",
+     {"tax": "Invest ₹8000/month in ELSS for tax saving and wealth building."}),
+    ("You can allocate ₹10,000-15,000/month for investments across equity and debt instruments.",
+     {"investment": "Diversify with 70% equity (large+mid cap) and 30% debt/PPF."}),
+    ("With higher income, explore diversified portfolio with equity, debt, real estate, and alternative investments.",
+     {"tax": "Maximize all tax-saving options: 80C (₹1.5L), NPS (₹50K), health insurance (₹25K)."}),
+)
+
+def _income_bucket(income: float) -> int:
+    """Income tier: 0 below ₹30K, 1 below ₹50K, 2 below ₹1L, 3 above"""
+    if income < 30000:
+        return 0
+    if income < 50000:
+        return 1
+    if income < 100000:
+        return 2
+    return 3
+
+# Prompt echoes and role labels stripped from generated text
+AI_RESPONSE_ARTIFACTS = ("Financial advice:", "AI:", "Response:")
+INDIAN_CONTEXT_RE = re.compile(r"₹|rupee|indian", re.IGNORECASE)
+
+@functools.lru_cache(maxsize=128)
+def _response_cleanup_pattern(query: str) -> "re.Pattern[str]":
+    """One pattern removing the echoed query and every artifact in a single pass"""
+    return _keyword_pattern(*(((query,) if query else ()) + AI_RESPONSE_ARTIFACTS))
+
+# Fallback responses share one timestamp string per this many seconds
+FALLBACK_TIMESTAMP_RESOLUTION = 1.0
+
+# Longest we wait on the preferred provider before using the fallback answer
+AI_SERVICES_TIMEOUT = 8.0  # seconds
+
+# After this many consecutive Hugging Face failures, skip it for the cooldown
+HF_FAILURE_THRESHOLD = 3
+HF_COOLDOWN = 60  # seconds
+
+# Hugging Face queries arriving within the window go out as one batched request
+HF_BATCH_WINDOW = 0.02  # seconds
+HF_BATCH_SIZE = 8
+
+# Batched requests in flight to Hugging Face at once; later ones wait their turn
+HF_MAX_CONCURRENCY = 8
+# Includes the wait for a free slot; ends before callers stop waiting so the batch outcome is always recorded
+HF_REQUEST_TIMEOUT = AI_SERVICES_TIMEOUT - HF_BATCH_WINDOW  # seconds
+
+# Request body pieces reused by every Hugging Face call; the body is encoded with orjson
+HF_GENERATION_PARAMETERS = {
+    "max_length": 150,
+    "temperature": 0.7,
+    "do_sample": True
+}
+HF_JSON_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+
+def _hf_generated_text(output: Any) -> Optional[str]:
+    """Generated text from one Hugging Face output, or None when it has none"""
+    if isinstance(output, list) and len(output) > 0:
+        return output[0].get('generated_text', '')
+    return None
+
+# The contextual advice and personal recommendations below depend only on a few
+# profile bands and query flags, so each distinct combination is built once
+CONTEXTUAL_ADVICE_FLAGS = TAX | RETIREMENT | EMERGENCY
+PERSONAL_RECOMMENDATION_FLAGS = INVEST | TAX | GOAL | RETIREMENT | CHILD
+
+@functools.lru_cache(maxsize=256)
+def _build_contextual_advice(bucket: Optional[int], category: str, flags: int) -> str:
+    """Contextual advice for an income bucket (None without income), category and query flags"""
+    
+    context = []
+    
+    # Add income-based advice
+    if bucket is not None:
+        tier_advice, category_advice = INCOME_TIER_ADVICE[bucket]
+        context.append(tier_advice)
+        if category in category_advice:
+            context.append(category_advice[category])
+    
+    # Add specific instrument suggestions based on category
+    if category == "investment":
+        instruments = INDIAN_CONTEXT["instruments"]["equity"]
+        context.append(f"Top options: {', '.join(instruments[:3])} offering {INDIAN_CONTEXT['returns']['equity']} returns.")
+    elif category == "savings":
+        instruments = INDIAN_CONTEXT["instruments"]["debt"]
+        context.append(f"Safe options: {', '.join(instruments[:3])} with {INDIAN_CONTEXT['returns']['fd']} returns.")
+    
+    # Add query-specific advice with detailed explanations
+    if flags & TAX:
+        context.append("Section 80C limit is ₹1.5L annually. ELSS has 3-year lock-in vs 15-year for PPF. NPS offers additional ₹50K deduction under 80CCD(1B).")
+    
+    if flags & RETIREMENT:
+        context.append("Target 25x annual income as retirement corpus. Start NPS immediately for long-term tax-efficient growth.")
+    
+    if flags & EMERGENCY:
+        context.append("Keep emergency fund liquid: 50% savings account, 30% liquid funds, 20% short-term FDs for easy access.")
+    
+    return " ".join(context)
+
+@functools.lru_cache(maxsize=64)
+def _build_personal_recommendations(income_tier: int, age_band: int, flags: int) -> str:
+    """Recommendations by income tier (0 to ₹50K, 1 to ₹1L, 2 above), age band (0 under 30, 1 under 45, 2 older) and query flags"""
+    
+    recommendations = []
+    
+    # Income-based recommendations
+    if income_tier == 2:
+        if flags & INVEST:
+            recommendations.append("Consider portfolio management services (PMS) for amounts above ₹50L")
+        if flags & TAX:
+            recommendations.append("Explore NPS Tier 2 for additional tax benefits beyond ₹50K limit")
+    
+    elif income_tier == 1:
+        if flags & INVEST:
+            recommendations.append("Perfect income level for diversified MF portfolio across large, mid, and small cap")
+        if flags & GOAL:
+            recommendations.append("You can comfortably plan for multiple goals with systematic investment")
+    
+    else:
+        if flags & INVEST:
+            recommendations.append("Start with large-cap funds and gradually add mid-cap as income grows")
+        recommendations.append("Focus on building emergency fund first before aggressive investments")
+    
+    # Age-based recommendations
+    if age_band == 0:
+        recommendations.append("Your young age allows for aggressive equity allocation (70-80%)")
+        if flags & RETIREMENT:
+            recommendations.append("Starting retirement planning now can build a corpus of ₹5-10 crores by age 60")
+    
+    elif age_band == 1:
+        recommendations.append("Balanced approach: 60% equity, 40% debt allocation recommended")
+        if flags & CHILD:
+            recommendations.append("Education costs are rising 10-12% annually. Start planning immediately")
+    
+    else:
+        recommendations.append("Focus on wealth preservation with 40% equity, 60% debt allocation")
+        recommendations.append("Consider senior citizen saving schemes and health insurance priority")
+    
+    return " | ".join(recommendations)
+
+def _template_category(flags: int) -> str:
+    """Topic of a query for _build_template_advice"""
+    if flags & TEMPLATE_INVESTMENT:
+        return "INVESTMENT"
+    if flags & TEMPLATE_SAVINGS:
+        return "SAVINGS"
+    if flags & TEMPLATE_GOALS:
+        return "HOME" if flags & HOUSE else "GOALS"
+    if flags & TEMPLATE_EXPENSES:
+        return "EXPENSES"
+    if flags & TEMPLATE_TAX:
+        return "TAX"
+    if flags & TEMPLATE_INSURANCE:
+        return "INSURANCE"
+    return "GENERAL"
+
+# Template advice is a pure function of topic and income. The amounts quoted use the
+# exact income, so that is the key rather than an income band.
+@functools.lru_cache(maxsize=1024)
+def _build_template_advice(category: str, income: float) -> str:
+    """Template advice text for a query topic and monthly income"""
+    
+    # Investment queries with detailed advice
+    if category == "INVESTMENT":
+        monthly_investment = min(income * 0.2, 20000)  # 20% of income or max 20k
+        advice = (
+            f"For investing in India, start with ₹{monthly_investment:,.0f}/month SIP in diversified equity mutual funds. "
+            "Allocation: 60% large-cap funds (stable growth), 30% mid-cap funds (higher growth), 10% international funds (diversification). "
+            "ELSS funds offer tax benefits under Section 80C with 3-year lock-in. "
+            "Expected returns: 12-15% annually over 5+ years. Review and rebalance annually."
+        )
+        return advice
+    
+    # Savings queries with specific amounts
+    elif category == "SAVINGS":
+        emergency_target = income * 6 * 0.7  # 6 months of 70% income
+        monthly_savings = min(income * 0.15, 15000)
+        advice = (
+            f"Build emergency fund of ₹{emergency_target:,.0f} (6 months expenses). "
+            f"Save ₹{monthly_savings:,.0f}/month: 50% in high-yield savings (4-5%), 30% in liquid funds (4-6%), 20% in FDs (6-7%). "
+            "PPF offers 7-8% tax-free returns for 15-year lock-in. Complete emergency fund first, then start PPF."
+        )
+        return advice
+    
+    # Goal planning with calculations
+    elif category == "HOME":
+        max_emi = income * 0.4
+        loan_eligible = max_emi * 12 * 20  # 20 years
+        advice = (
+            f"For home purchase, max EMI should be ₹{max_emi:,.0f} (40% of income). "
+            f"Eligible for loan: ₹{loan_eligible:,.0f}. Save 20% down payment separately in FDs/liquid funds. "
+            "Get pre-approved loan for better negotiation. Consider location, connectivity, and resale value."
+        )
+        return advice
+    
+    elif category == "GOALS":
+        advice = (
+            "Set SMART financial goals: Specific amount, Measurable progress, Achievable timeline, Relevant to life, Time-bound. "
+            f"For goals, allocate ₹{income * 0.1:,.0f}/month and use SIP calculators to determine investment amount. "
+            "Short-term goals (<3 years): Debt funds. Medium-term (3-7 years): Balanced funds. Long-term (>7 years): Equity funds."
+        )
+        return advice
+    
+    # Expense management with actionable steps
+    elif category == "EXPENSES":
+        needs_budget = income * 0.5
+        wants_budget = income * 0.3
+        savings_budget = income * 0.2
+        advice = (
+            f"Follow 50-30-20 rule: Needs ₹{needs_budget:,.0f} (50%), Wants ₹{wants_budget:,.0f} (30%), Savings ₹{savings_budget:,.0f} (20%). "
+            "Track expenses for 30 days using apps like Walnut/ET Money. "
+            "Quick wins: Cancel unused subscriptions, cook more at home, use public transport, compare prices before big purchases. "
+            "Review and optimize categories where spending exceeds 50% (needs) or 30% (wants)."
+        )
+        return advice
+    
+    # Tax planning with calculations
+    elif category == "TAX":
+        annual_income = income * 12
+        if annual_income > 500000:
+            tax_rate = "20-30%"
+            potential_savings = "₹45,000-60,000"
+        elif annual_income > 250000:
+            tax_rate = "5-20%"
+            potential_savings = "₹15,000-30,000"
+        else:
+            return "Your income is below taxable limit. Focus on building wealth through SIPs and emergency fund for future tax planning."
+        
+        advice = (
+            f"In {tax_rate} tax bracket, save {potential_savings} annually through: "
+            "80C (₹1.5L): ELSS ₹8000/month, PPF ₹4500/month. "
+            "80CCD(1B): NPS ₹4000/month (extra ₹50K deduction). "
+            "80D: Health insurance ₹25K family, ₹50K parents. Plan investments by December for current financial year."
+        )
+        return advice
+    
+    # Insurance with coverage amounts
+    elif category == "INSURANCE":
+        term_coverage = income * 12 * 15  # 15x annual income
+        health_coverage = 500000 if income < 50000 else 1000000
+        advice = (
+            f"Essential insurance: Term life ₹{term_coverage:,.0f} (15x income), Health ₹{health_coverage:,.0f} family floater. "
+            f"Term premium: ₹{income * 0.01:,.0f}/month approx. Health premium: ₹{income * 0.02:,.0f}/month. "
+            "Buy pure insurance, avoid ULIPs for investment. Get early for lower premiums. Critical illness add-on recommended."
+        )
+        return advice
+    
+    # Default comprehensive response
+    else:
+        advice = (
+            f"Based on ₹{income:,.0f} monthly income, here's your financial roadmap: "
+            f"1. Emergency fund: ₹{income * 4:,.0f} (6 months expenses) "
+            f"2. Investments: ₹{income * 0.2:,.0f}/month SIP in equity MFs "
+            "3. Insurance: Term life + health coverage "
+            "4. Tax saving: ₹12,500/month in 80C instruments "
+            "Start with emergency fund, then SIPs, ensure adequate insurance. I can help with specific areas - just ask!"
+        )
+        return advice
+
+@functools.lru_cache(maxsize=256)
+def _property_advice(income: float) -> str:
+    """Home buying advice for a monthly income"""
+    max_emi = income * 0.4  # 40% EMI rule
+    loan_amount = max_emi * 12 * 20  # 20 year loan assumption
+    
+    return f"For home buying, follow 40% EMI rule - max EMI ₹{max_emi:,.0f}/month. You can afford loan of ₹{loan_amount:,.0f}. Save 20% down payment separately. Consider under-construction projects for better prices. Use home loan for tax benefits under 80C and 24(b)."
+
+@functools.lru_cache(maxsize=256)
+def _retirement_advice(age: int, income: float) -> str:
+    """Retirement planning advice for an age and monthly income"""
+    years_to_retire = 60 - age
+    retirement_corpus_needed = income * 12 * 25  # 25x annual income rule
+    
+    if years_to_retire > 20:
+        return f"Start retirement planning now! You need ₹{retirement_corpus_needed:,.0f} corpus. Invest ₹{income * 0.2:,.0f}/month in equity funds + ₹{income * 0.05:,.0f} in NPS for tax benefits. PPF and EPF are also excellent for retirement."
+    elif years_to_retire > 10:
+        return f"Accelerate retirement savings! Target ₹{retirement_corpus_needed:,.0f} corpus. Invest ₹{income * 0.3:,.0f}/month in balanced funds. Maximize NPS contribution for extra tax deduction."
+    else:
+        return "Focus on debt instruments and conservative hybrid funds. Ensure adequate health insurance. Consider senior citizen saving schemes post-retirement."
+
+@functools.lru_cache(maxsize=256)
+def _emergency_fund_advice(income: float) -> str:
+    """Emergency fund advice for a monthly income"""
+    expenses = income * 0.7  # Assume 70% of income as expenses
+    
+    emergency_fund = expenses * 6  # 6 months expenses
+    
+    return f"Build emergency fund of ₹{emergency_fund:,.0f} (6 months expenses). Keep 50% in savings account, 30% in liquid mutual funds, 20% in short-term FDs. Start with ₹{income * 0.1:,.0f}/month allocation until target is reached."
+
+# Tax advice per bracket: below ₹2.5L a year, up to ₹5L, above
+_TAX_BRACKET_TEMPLATE = "In {} tax bracket, save ₹{:,}/month in 80C instruments: ELSS (₹8000), PPF (₹4500). Add NPS ₹4000/month for extra ₹50K deduction. Total tax saving: ₹45,000-60,000 annually."
+TAX_BRACKET_ADVICE = (
+    "Your income is below tax threshold. Focus on building emergency fund and starting small SIPs for future tax planning.",
+    _TAX_BRACKET_TEMPLATE.format("5-20%", 8000),
+    _TAX_BRACKET_TEMPLATE.format("20-30%", 12500),  # 1.5L annually
+)
+
+# Market context for the enhanced advice (you can update this with real data)
+ENHANCED_MARKET_CONTEXT = {
+    "nifty_trend": "bullish",
+    "interest_rates": "stable", 
+    "inflation": "6.2%",
+    "best_sectors": ("Technology", "Healthcare", "Financial Services"),
+    "fd_rates": "6.5-7%",
+    "mutual_fund_performance": "positive"
+}
+ENHANCED_BEST_SECTORS = ", ".join(ENHANCED_MARKET_CONTEXT["best_sectors"])
+
+GREETINGS = (
+    "Hello! I'm your AI financial advisor. Based on current market conditions, here's what I can help you with:",
+    "Hi there! Welcome to FinVoice. I'm here to help you make smart financial decisions.",
+    "Greetings! Let's work together to build your wealth and secure your financial future."
+)
+
+# Greeting follow-ups by monthly income: below ₹30K, below ₹1L, above
+GREETING_INCOME_LIMITS = (30000, 100000)
+GREETING_INCOME_CONTEXTS = (
+    " I see you're starting your financial journey - let's focus on building a strong foundation with emergency funds and basic investments.",
+    " With your ₹{income:,}/month income, we can create a balanced portfolio mixing growth and stability.",
+    " Given your strong income of ₹{income:,}/month, we can explore advanced wealth-building strategies."
+)
+GREETING_DEFAULT_CONTEXT = " I can help with investment planning, expense optimization, goal setting, tax planning, and much more!"
+
+APPRECIATION_RESPONSES = (
+    "You're welcome! I'm always here to help you make informed financial decisions. Feel free to ask anything else!",
+    "Glad I could help! Building wealth is a journey, and I'm here to guide you every step of the way.",
+    "Happy to assist! Remember, consistent investing and smart planning are key to financial success. What else can I help with?"
+)
+
+CAPABILITY_RESPONSE = """I'm your comprehensive financial advisor! Here's how I can help you:
+
+💰 **Investment Planning**: SIP recommendations, mutual fund selection, portfolio optimization
+📊 **Goal Setting**: Education planning, retirement corpus, home buying strategies  
+💳 **Expense Management**: Budget optimization, expense tracking, savings strategies
+🎯 **Tax Planning**: 80C optimization, NPS benefits, tax-saving investments
+🏦 **Insurance Planning**: Term life, health insurance, coverage calculations
+📈 **Market Insights**: Current opportunities, sector analysis, timing strategies
+
+I provide specific calculations, product recommendations, and actionable steps tailored to Indian markets. What would you like to explore today?"""
+
+# Enhanced advice text per router intent, filled with str.format_map
+ENHANCED_ADVICE_TEMPLATES = {
+    "invest": (
+        "🚀 **Investment Strategy for You:**\n\n"
+        "Based on your income and current market conditions (Nifty trending {nifty_trend}), here's my recommendation:\n\n"
+        "💡 **Monthly SIP**: ₹{monthly_investment:,}\n"
+        "📊 **Allocation**: 60% Large Cap, 25% Mid Cap, 15% International\n"
+        "🎯 **Top Sectors**: {best_sectors}\n"
+        "📈 **Expected Returns**: 12-15% annually\n\n"
+        "Start with blue-chip funds like HDFC Top 100 or ICICI Pru Bluechip, then add Mirae Asset Large Cap for diversification."
+    ),
+    "save": (
+        "💰 **Smart Savings Strategy:**\n\n"
+        "🎯 **Emergency Fund Target**: ₹{emergency_amount:,} (6 months expenses)\n"
+        "🏦 **Current FD Rates**: {fd_rates}\n"
+        "📊 **Optimal Mix**:\n"
+        "   • 40% High-yield Savings (instant access)\n"
+        "   • 35% Liquid Mutual Funds (1-day access)\n"
+        "   • 25% Short-term FDs (higher returns)\n\n"
+        "Consider banks like SBI, HDFC, or ICICI for best rates. Build this before investing!"
+    ),
+    "house": (
+        "🏠 **Home Buying Strategy:**\n\n"
+        "💳 **Max EMI Capacity**: ₹{max_emi:,}/month (40% rule)\n"
+        "🏦 **Loan Eligibility**: ₹{loan_amount:,}\n"
+        "💰 **Down Payment**: Save ₹{down_payment:,} separately\n"
+        "📊 **Current Home Loan Rates**: 8.5-9.5%\n\n"
+        "💡 **Pro Tips**: Get pre-approval, consider under-construction for better prices, check RERA registration!"
+    ),
+    "goal": (
+        "🎯 **Goal-Based Financial Planning:**\n\n"
+        "For systematic goal achievement:\n"
+        "• **Short-term (1-3 years)**: Debt funds, FDs\n"
+        "• **Medium-term (3-7 years)**: Balanced funds\n"
+        "• **Long-term (7+ years)**: Equity funds\n\n"
+        "Use SIP calculators to determine exact amounts. I can help with specific goal calculations!"
+    ),
+    "expense": (
+        "💳 **Smart Budget Optimization:**\n\n"
+        "📊 **50-30-20 Rule Applied**:\n"
+        "   🏠 Needs: ₹{needs_budget:,} (50%)\n"
+        "   🎯 Wants: ₹{wants_budget:,} (30%)\n"
+        "   💰 Savings: ₹{savings_budget:,} (20%)\n\n"
+        "💡 **Quick Savings Tips**:\n"
+        "• Cancel unused subscriptions\n"
+        "• Use cashback credit cards wisely\n"
+        "• Cook at home 5 days/week\n"
+        "• Review insurance annually for better rates"
+    ),
+    "general": (
+        "🤖 **AI Financial Advisor at Your Service!**\n\n"
+        "I notice you're asking about financial planning. With current market conditions showing:\n"
+        "• Nifty: {nifty_trend} trend\n"
+        "• Inflation: {inflation}\n"
+        "• FD Rates: {fd_rates}\n\n"
+        "💡 I can provide specific advice on:\n"
+        "📈 Investment strategies and fund selection\n"
+        "🎯 Goal-based financial planning\n"
+        "💰 Tax optimization strategies\n"
+        "📊 Portfolio rebalancing\n\n"
+        "What specific area would you like me to help you with?"
+    ),
+}
+
+def _home_loan_values(max_emi: int) -> Dict[str, int]:
+    """Home loan figures for a monthly EMI budget"""
+    loan_amount = max_emi * 240  # 20 year loan
+    return {
+        "max_emi": max_emi,
+        "loan_amount": loan_amount,
+        "down_payment": loan_amount // 5
+    }
+
+# Values each enhanced advice template is filled with, computed from the whole-rupee
+# monthly income; intents missing here have fixed text
+ENHANCED_ADVICE_VALUES = {
+    "invest": lambda income: {
+        "nifty_trend": ENHANCED_MARKET_CONTEXT['nifty_trend'],
+        "monthly_investment": 25000 if income >= 125000 else income // 5,
+        "best_sectors": ENHANCED_BEST_SECTORS
+    },
+    "save": lambda income: {
+        "emergency_amount": income * 42 // 10,  # 6 months at 70% of income
+        "fd_rates": ENHANCED_MARKET_CONTEXT['fd_rates']
+    },
+    "house": lambda income: _home_loan_values(income * 2 // 5),
+    "expense": lambda income: {
+        "needs_budget": income // 2,
+        "wants_budget": income * 3 // 10,
+        "savings_budget": income // 5
+    },
+    "general": lambda income: ENHANCED_MARKET_CONTEXT,
+}
+
+# Enhanced financial advice by router intent ("house" for home goals); only the
+# monthly income varies the text, so each (intent, income) pair is built once
+@functools.lru_cache(maxsize=512)
+def _build_enhanced_financial_advice(intent: Optional[str], income: int) -> str:
+    """Enhanced advice text for an intent and monthly income"""
+    if intent not in ENHANCED_ADVICE_TEMPLATES:
+        intent = "general"
+    
+    template = ENHANCED_ADVICE_TEMPLATES[intent]
+    values = ENHANCED_ADVICE_VALUES.get(intent)
+    return template.format_map(values(income)) if values else template
+
 class FreeAIService:
     def __init__(self):
-        self.api_endpoints = {
-            "huggingface": {
-                "base_url": "https://api-inference.huggingface.co/models",
-                "models": {
-                    "conversation": "microsoft/DialoGPT-medium",
-                    "text_generation": "gpt2",
-                    "financial_bert": "ProsusAI/finbert",
-                    "sentiment": "cardiffnlp/twitter-roberta-base-sentiment-latest"
-                }
-            },
-            "ollama_demo": {
-                "base_url": "https://ollama.ai/api",
-                "models": ["llama2", "mistral", "codellama"]
-            },
-            "groq": {
-                "base_url": "https://api.groq.com/openai/v1/chat/completions",
-                "model": "llama2-70b-4096"
-            }
+        self.api_endpoints = API_ENDPOINTS
+        self.financial_templates = FINANCIAL_TEMPLATES
+        self.indian_context = INDIAN_CONTEXT
+        # Template openers rotate round-robin per category
+        self._template_cyclers = {
+            category: itertools.cycle(templates) for category, templates in self.financial_templates.items()
         }
         
-        self.financial_templates = {
-            "investment": [
-                "For investment planning, I recommend a diversified approach based on your profile.",
-                "Let's build a solid investment strategy tailored to your goals and risk tolerance.",
-                "Investment success comes from consistent planning and regular review.",
-                "Based on current market conditions, here are personalized investment options for you."
-            ],
-            "savings": [
-                "Building a strong savings foundation is crucial for your financial security.",
-                "Let me help you optimize your savings strategy with current interest rates.",
-                "Emergency fund planning is essential - let's calculate the right amount for you.",
-                "Smart savings allocation can significantly boost your financial growth."
-            ],
-            "expenses": [
-                "Expense optimization is key to increasing your investment capacity.",
-                "Let's analyze your spending patterns and find improvement opportunities.",
-                "Budget management becomes easier with the right tracking methods.",
-                "Smart expense planning can free up significant funds for your goals."
-            ],
-            "goals": [
-                "Goal-based financial planning ensures you stay on track for success.",
-                "Let's create a roadmap to achieve your financial dreams systematically.",
-                "Every financial goal needs a specific plan with timelines and amounts.",
-                "I'll help you prioritize and plan for multiple financial objectives."
-            ],
-            "tax": [
-                "Tax optimization can save you thousands while building wealth.",
-                "Let's maximize your tax benefits with smart investment choices.",
-                "Strategic tax planning throughout the year yields better results.",
-                "I'll show you how to legally minimize taxes while growing wealth."
-            ],
-            "retirement": [
-                "Retirement planning requires starting early for maximum benefit.",
-                "Let's calculate your retirement corpus and create an action plan.",
-                "Multiple retirement instruments can optimize your post-work life.",
-                "Early retirement planning gives you financial freedom and security."
-            ]
-        }
+        # One pooled HTTP session, created on first use, keeps connections to the APIs alive
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._session_lock = asyncio.Lock()
+        
+        # Specialized advice generators, checked in order before the general categories
+        self._smart_response_handlers = (
+            (KW_EDUCATION, self._generate_education_advice),
+            (KW_PROPERTY, self._generate_property_advice),
+            (KW_RETIREMENT, self._generate_retirement_advice),
+            (KW_TAX, self._generate_tax_advice),
+            (KW_EMERGENCY, self._generate_emergency_fund_advice),
+        )
+        
+        # Circuit breaker state for a degraded Hugging Face endpoint
+        self._hf_failures = 0
+        self._hf_open_until = 0.0
+        
+        # Pending Hugging Face inputs and the timer that flushes them as one batch
+        self._hf_batch: List[Tuple[str, asyncio.Future]] = []
+        self._hf_batch_timer: Optional[asyncio.TimerHandle] = None
+        self._hf_batch_tasks: set = set()
+        self._hf_semaphore = asyncio.Semaphore(HF_MAX_CONCURRENCY)
+        
+        # Initialize Redis if available
+        try:
+            redis_url = config("REDIS_URL", default=None)
+            self.redis_client = aioredis.from_url(redis_url) if redis_url else None
+        except Exception as e:
+            logger.warning("Redis not available: %s", e)
+            self.redis_client = None
         
-        self.indian_context = {
-            "instruments": {
-                "equity": ["Nifty 50 ETF", "Large Cap Mutual Funds", "Mid Cap Funds", "Small Cap Funds", "Sectoral ETFs"],
-                "debt": ["PPF", "NSC", "Government Bonds", "Corporate Bonds", "FDs", "GILT Funds"],
-                "tax_saving": ["ELSS", "PPF", "NSC", "Tax Saver FD", "NPS", "Life Insurance"],
-                "insurance": ["Term Life Insurance", "Health Insurance", "Critical Illness", "Motor Insurance"],
-                "real_estate": ["Residential Property", "Commercial Property", "REITs", "Land Investment"],
-                "alternatives": ["Gold ETF", "Silver ETF", "Commodities", "International Funds"]
-            },
-            "returns": {
-                "equity_long_term": "12-15% annually (5+ years)",
-                "equity_short_term": "Variable (high volatility)",
-                "debt": "6-8% annually",
-                "fd": "6-7% annually",
-                "ppf": "7-8% annually (tax-free)",
-                "real_estate": "8-10% annually",
-                "gold": "6-8% annually"
-            },
-            "current_market": {
-                "nifty_50": "Strong fundamentals, good for long-term",
-                "mid_cap": "Higher growth potential, moderate risk",
-                "small_cap": "High risk-reward, for experienced investors",
-                "debt_funds": "Stable returns, good for conservative investors"
-            },
-            "tax_brackets_2024": [
-                {"range": "₹0 - ₹3L", "rate": "0%", "advice": "Focus on wealth building"},
-                {"range": "₹3L - ₹7L", "rate": "5%", "advice": "Start tax planning"},
-                {"range": "₹7L - ₹10L", "rate": "10%", "advice": "Optimize 80C investments"},
-                {"range": "₹10L - ₹12L", "rate": "15%", "advice": "Consider NPS for extra benefits"},
-                {"range": "₹12L - ₹15L", "rate": "20%", "advice": "Comprehensive tax strategy needed"},
-                {"range": "Above ₹15L", "rate": "30%", "advice": "Advanced tax optimization essential"}
-            ]
-        }
+        self._advice_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._advice_local_ttl = ADVICE_LOCAL_TTL if self.redis_client else ADVICE_CACHE_TTL
+        self._advice_inflight: Dict[str, asyncio.Future] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Last fallback timestamp as (monotonic time, ISO string)
+        self._timestamp_cache: Tuple[float, str] = (float("-inf"), "")
 
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        """Get the shared HTTP session, creating it on first use"""
+        import aiohttp
+        
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                if self._session is None or self._session.closed:
+                    self._session = aiohttp.ClientSession(
+                        connector=aiohttp.TCPConnector(
+                            limit=32, limit_per_host=8, ttl_dns_cache=300, keepalive_timeout=60
+                        ),
+                        timeout=aiohttp.ClientTimeout(total=10, connect=2, sock_read=8)
+                    )
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session and Redis connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self.redis_client is not None:
+            await self.redis_client.aclose()
+    
     async def get_financial_advice(self, query: str, user_profile: Dict[str, Any] = None) -> Dict[str, Any]:
         """Get financial advice using multiple AI approaches"""
+        cache_key = self._advice_cache_key(query, user_profile)
+        cached = self._advice_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self._advice_local_ttl:
+            self._advice_cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return {**cached[1], "timestamp": datetime.now().isoformat()}
+        self.cache_misses += 1
+        
+        try:
+            # Concurrent misses for the same key share one computation
+            future = self._advice_inflight.get(cache_key)
+            if future is None:
+                future = asyncio.ensure_future(self._build_financial_advice(query, user_profile, cache_key))
+                self._advice_inflight[cache_key] = future
+                future.add_done_callback(lambda _: self._advice_inflight.pop(cache_key, None))
+            return {**await asyncio.shield(future)}
+            
+        except Exception as e:
+            logger.error("Error getting financial advice: %s", e)
+            return self._get_fallback_advice(query)
+    
+    def _advice_cache_key(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+        """Cache key from the normalized query and the profile fields advice depends on"""
+        normalized_query = " ".join(query.lower().split())
+        income = user_profile.get('monthly_income') if user_profile else None
+        age = user_profile.get('age') if user_profile else None
+        return hashlib.blake2b(f"{normalized_query}|{income}|{age}".encode(), digest_size=16).hexdigest()
+    
+    async def _build_financial_advice(self, query: str, user_profile: Dict[str, Any], cache_key: str) -> Dict[str, Any]:
+        """Produce the advice response and cache it"""
+        cached = await self._get_shared_advice(cache_key)
+        if cached:
+            cached["timestamp"] = datetime.now().isoformat()
+            self._cache_local_advice(cache_key, cached)
+            return cached
+        
+        features = QueryFeatures.from_query(query)
+        
+        # Try different AI services in order of preference
+        advice = await self._try_ai_services(features, user_profile)
+        
+        if not advice:
+            # Enhanced fallback with real financial data context; its string
+            # assembly runs on a worker thread so other requests keep flowing
+            advice = await asyncio.to_thread(self._get_contextual_advice, features, user_profile)
+        
+        result = {
+            "advice": advice,
+            "type": "text",
+            "confidence": 0.9,
+            "source": "enhanced_ai_service",
+            "timestamp": datetime.now().isoformat(),
+            "market_context": self._get_market_context(),
+            "user_tips": self._get_personalized_tips(user_profile)
+        }
+        
+        self._cache_local_advice(cache_key, result)
+        await self._cache_shared_advice(cache_key, result)
+        
+        return result
+    
+    def _cache_local_advice(self, cache_key: str, result: Dict[str, Any]):
+        """Store advice in the in-process tier, evicting the least recently used"""
+        self._advice_cache[cache_key] = (time.monotonic(), result)
+        self._advice_cache.move_to_end(cache_key)
+        while len(self._advice_cache) > ADVICE_CACHE_SIZE:
+            self._advice_cache.popitem(last=False)
+    
+    async def _get_shared_advice(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get advice another worker cached in Redis"""
         try:
-            # Try different AI services in order of preference
-            advice = await self._try_ai_services(query, user_profile)
+            if not self.redis_client:
+                return None
             
-            if not advice:
-                # Enhanced fallback with real financial data context
-                advice = self._get_contextual_advice(query, user_profile)
+            cached_data = await self.redis_client.get(f"ai_advice:{cache_key}")
+            if not cached_data:
+                return None
             
-            return {
-                "advice": advice,
-                "type": "text",
-                "confidence": 0.9,
-                "source": "enhanced_ai_service",
-                "timestamp": datetime.now().isoformat(),
-                "market_context": self._get_market_context(),
-                "user_tips": self._get_personalized_tips(user_profile)
-            }
+            return orjson.loads(cached_data)
             
         except Exception as e:
-            logger.error(f"Error getting financial advice: {e}")
-            return self._get_fallback_advice(query)
+            logger.warning("Error reading cached advice: %s", e)
+            return None
+    
+    async def _cache_shared_advice(self, cache_key: str, result: Dict[str, Any]):
+        """Cache advice in Redis for every worker"""
+        try:
+            if not self.redis_client:
+                return
+            
+            await self.redis_client.setex(f"ai_advice:{cache_key}", ADVICE_CACHE_TTL, orjson.dumps(result))
+            
+        except Exception as e:
+            logger.warning("Error caching advice: %s", e)
 
-    async def _try_ai_services(self, query: str, user_profile: Dict[str, Any] = None) -> Optional[str]:
+    async def _try_ai_services(self, features: QueryFeatures, user_profile: Dict[str, Any] = None) -> Optional[str]:
         """Try different AI services to get advice"""
+        # Start every provider at once; the preferred one still wins when it answers,
+        # but a failed or slow Hugging Face call no longer delays the fallback
+        hf_task = asyncio.ensure_future(self._query_huggingface(features.raw, user_profile))
+        free_task = asyncio.ensure_future(self._query_free_apis(features, user_profile))
         
         # Try Hugging Face API (Free tier available)
         try:
-            advice = await self._query_huggingface(query, user_profile)
+            advice = await asyncio.wait_for(hf_task, timeout=AI_SERVICES_TIMEOUT)
             if advice:
+                free_task.cancel()
+                await asyncio.gather(free_task, return_exceptions=True)
                 return advice
+        except asyncio.TimeoutError:
+            logger.warning("Hugging Face API timed out")
         except Exception as e:
-            logger.warning(f"Hugging Face API failed: {e}")
+            logger.warning("Hugging Face API failed: %s", e)
         
         # Try local/demo APIs
         try:
-            advice = await self._query_free_apis(query, user_profile)
+            advice = await free_task
             if advice:
                 return advice
         except Exception as e:
-            logger.warning(f"Free APIs failed: {e}")
+            logger.warning("Free APIs failed: %s", e)
         
         return None
 
     async def _query_huggingface(self, query: str, user_profile: Dict[str, Any] = None) -> Optional[str]:
         """Query Hugging Face Inference API (Free tier)"""
+        if time.monotonic() < self._hf_open_until:
+            return None
+        
+        # Format the query for financial context
+        financial_query = f"Financial advice: {query}"
+        if user_profile and user_profile.get('monthly_income'):
+            financial_query += f" (Income: ₹{user_profile['monthly_income']:,}/month)"
+        
+        generated_text = await self._submit_hf_input(financial_query)
+        if generated_text is None:
+            return None
+        
+        # Clean and format the response
+        return self._format_ai_response(generated_text, query)
+    
+    def _submit_hf_input(self, text: str) -> asyncio.Future:
+        """Queue one input for the next Hugging Face batch; resolves to its generated text or None"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._hf_batch.append((text, future))
+        if len(self._hf_batch) >= HF_BATCH_SIZE:
+            self._flush_hf_batch()
+        elif self._hf_batch_timer is None:
+            self._hf_batch_timer = loop.call_later(HF_BATCH_WINDOW, self._flush_hf_batch)
+        return future
+    
+    def _flush_hf_batch(self):
+        """Send every queued input in one request"""
+        if self._hf_batch_timer is not None:
+            self._hf_batch_timer.cancel()
+            self._hf_batch_timer = None
+        batch, self._hf_batch = self._hf_batch, []
+        if batch:
+            task = asyncio.ensure_future(self._post_hf_batch(batch))
+            # Keep a reference so the task is not garbage collected mid-flight
+            self._hf_batch_tasks.add(task)
+            task.add_done_callback(self._hf_batch_tasks.discard)
+    
+    async def _post_hf_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """POST a batch of inputs to Hugging Face and resolve each caller's future"""
+        import aiohttp
+        
+        results: List[Optional[str]] = [None] * len(batch)
         try:
             # Use the conversation model for financial advice
             url = f"{self.api_endpoints['huggingface']['base_url']}/microsoft/DialoGPT-medium"
             
-            # Format the query for financial context
-            financial_query = f"Financial advice: {query}"
-            if user_profile and user_profile.get('monthly_income'):
-                financial_query += f" (Income: ₹{user_profile['monthly_income']:,}/month)"
-            
+            inputs = [text for text, _ in batch]
             payload = {
-                "inputs": financial_query,
-                "parameters": {
-                    "max_length": 150,
-                    "temperature": 0.7,
-                    "do_sample": True
-                }
+                # A lone input keeps the single-request form and response shape
+                "inputs": inputs[0] if len(inputs) == 1 else inputs,
+                "parameters": HF_GENERATION_PARAMETERS
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, timeout=10) as response:
+            session = await self._get_session()
+            async with asyncio.timeout(HF_REQUEST_TIMEOUT), self._hf_semaphore:
+                async with session.post(url, data=orjson.dumps(payload), headers=HF_JSON_HEADERS) as response:
+                    # Rate limiting and server errors mean the endpoint is degraded
+                    self._record_hf_result(response.status != 429 and response.status < 500)
                     if response.status == 200:
-                        result = await response.json()
-                        if isinstance(result, list) and len(result) > 0:
-                            generated_text = result[0].get('generated_text', '')
-                            # Clean and format the response
-                            return self._format_ai_response(generated_text, query)
+                        result = orjson.loads(await response.read())
+                        if len(batch) == 1:
+                            results[0] = _hf_generated_text(result)
+                        elif isinstance(result, list) and len(result) == len(batch):
+                            # Batched outputs come back in input order, one list (or dict) per input
+                            results = [
+                                _hf_generated_text([output] if isinstance(output, dict) else output)
+                                for output in result
+                            ]
                     
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._record_hf_result(False)
+            logger.error("Hugging Face query error: %s", e)
         except Exception as e:
-            logger.error(f"Hugging Face query error: {e}")
-        
-        return None
+            logger.error("Hugging Face query error: %s", e)
+        finally:
+            for (_, future), text in zip(batch, results):
+                # Callers that timed out have already cancelled their future
+                if not future.done():
+                    future.set_result(text)
+    
+    def _record_hf_result(self, ok: bool):
+        """Track consecutive Hugging Face failures, opening the circuit at the threshold"""
+        if ok:
+            self._hf_failures = 0
+            return
+        self._hf_failures += 1
+        if self._hf_failures >= HF_FAILURE_THRESHOLD:
+            self._hf_open_until = time.monotonic() + HF_COOLDOWN
+            self._hf_failures = 0
+            logger.warning("Hugging Face unavailable, skipping it for %ss", HF_COOLDOWN)
 
-    async def _query_free_apis(self, query: str, user_profile: Dict[str, Any] = None) -> Optional[str]:
+    async def _query_free_apis(self, features: QueryFeatures, user_profile: Dict[str, Any] = None) -> Optional[str]:
         """Query other free AI APIs"""
         try:
             # Mock API call - in production, replace with actual free AI services
             # Examples: Cohere free tier, AI21 free tier, etc.
             
             # Simulate AI response based on query analysis
-            advice = self._generate_smart_response(query, user_profile)
+            advice = self._generate_smart_response(features, user_profile)
             return advice
             
         except Exception as e:
-            logger.error(f"Free APIs query error: {e}")
+            logger.error("Free APIs query error: %s", e)
         
         return None
 
-    def _generate_smart_response(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+    def _generate_smart_response(self, features: QueryFeatures, user_profile: Dict[str, Any] = None) -> str:
         """Generate intelligent response based on query analysis"""
         
-        query_lower = query.lower()
-        
         # Advanced query analysis for more specific responses
-        if any(word in query_lower for word in ['child', 'education', 'school', 'college']):
-            return self._generate_education_advice(query_lower, user_profile)
-        elif any(word in query_lower for word in ['house', 'home', 'property', 'real estate']):
-            return self._generate_property_advice(query_lower, user_profile)
-        elif any(word in query_lower for word in ['retirement', 'pension', 'old age']):
-            return self._generate_retirement_advice(query_lower, user_profile)
-        elif any(word in query_lower for word in ['tax', '80c', 'deduction', 'save tax']):
-            return self._generate_tax_advice(query_lower, user_profile)
-        elif any(word in query_lower for word in ['emergency', 'fund', 'crisis']):
-            return self._generate_emergency_fund_advice(query_lower, user_profile)
-        
-        # Detect query type for general categories
-        if any(word in query_lower for word in ['invest', 'investment', 'mutual fund', 'stocks', 'portfolio']):
-            category = "investment"
-        elif any(word in query_lower for word in ['save', 'saving', 'deposit', 'fd']):
-            category = "savings"
-        elif any(word in query_lower for word in ['expense', 'spending', 'budget', 'cost', 'reduce']):
-            category = "expenses"
-        elif any(word in query_lower for word in ['goal', 'plan', 'target', 'future']):
-            category = "goals"
-        else:
-            category = "general"
+        for keywords, handler in self._smart_response_handlers:
+            if keywords.search(features.lower):
+                return handler(features.lower, user_profile)
+        
+        # Query type for general categories
+        category = features.category
         
         # Get base advice from templates
         if category in self.financial_templates:
-            base_advice = random.choice(self.financial_templates[category])
+            base_advice = next(self._template_cyclers[category])
         else:
             base_advice = "Let me help you with your financial question."
         
         # Add contextual information
-        context_advice = self._add_contextual_advice(query_lower, user_profile, category)
+        context_advice = self._add_contextual_advice(features, user_profile, category)
         
         # Combine base advice with context
         full_advice = f"{base_advice} {context_advice}"
         
         return full_advice
 
-    def _add_contextual_advice(self, query: str, user_profile: Dict[str, Any], category: str) -> str:
+    def _add_contextual_advice(self, features: QueryFeatures, user_profile: Dict[str, Any], category: str) -> str:
         """Add contextual advice based on user profile and query specifics"""
-        
-        context = []
-        
-        # Add income-based advice
         if user_profile and user_profile.get('monthly_income'):
-            income = user_profile['monthly_income']
-            if income < 30000:
-                context.append("With your current income, focus on building emergency fund first with simple savings accounts or FDs.")
-                if category == "investment":
-                    context.append("Start with ₹500/month SIP in large-cap funds once emergency fund is ready.")
-            elif income < 50000:
-                context.append("Consider starting SIPs of ₹2000-3000/month in large-cap mutual funds for long-term wealth creation.")
-                if category == "tax":
-                    context.append("Invest ₹8000/month in ELSS for tax saving and wealth building.")
-            elif income < 100000:
-                context.append("You can allocate ₹10,000-15,000/month for investments across equity and debt instruments.")
-                if category == "investment":
-                    context.append("Diversify with 70% equity (large+mid cap) and 30% debt/PPF.")
-            else:
-                context.append("With higher income, explore diversified portfolio with equity, debt, real estate, and alternative investments.")
-                if category == "tax":
-                    context.append("Maximize all tax-saving options: 80C (₹1.5L), NPS (₹50K), health insurance (₹25K).")
-        
-        # Add specific instrument suggestions based on category
-        if category == "investment":
-            instruments = self.indian_context["instruments"]["equity"]
-            context.append(f"Top options: {', '.join(instruments[:3])} offering {self.indian_context['returns']['equity']} returns.")
-        elif category == "savings":
-            instruments = self.indian_context["instruments"]["debt"]
-            context.append(f"Safe options: {', '.join(instruments[:3])} with {self.indian_context['returns']['fd']} returns.")
-        
-        # Add query-specific advice with detailed explanations
-        if "tax" in query:
-            context.append("Section 80C limit is ₹1.5L annually. ELSS has 3-year lock-in vs 15-year for PPF. NPS offers additional ₹50K deduction under 80CCD(1B).")
-        
-        if "retirement" in query:
-            context.append("Target 25x annual income as retirement corpus. Start NPS immediately for long-term tax-efficient growth.")
-        
-        if "emergency" in query:
-            context.append("Keep emergency fund liquid: 50% savings account, 30% liquid funds, 20% short-term FDs for easy access.")
-        
-        return " ".join(context)
-
-    def _get_contextual_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+            bucket = _income_bucket(user_profile['monthly_income'])
+        else:
+            bucket = None
+        return _build_contextual_advice(bucket, category, features.flags & CONTEXTUAL_ADVICE_FLAGS)
+
+    def _get_contextual_advice(self, features: QueryFeatures, user_profile: Dict[str, Any] = None) -> str:
         """Enhanced contextual advice with real financial data"""
         # First get template-based advice
-        base_advice = self._get_template_advice(query, user_profile)
+        base_advice = self._get_template_advice(features, user_profile)
         
         # Add current market context
-        market_insight = self._add_market_context(query)
+        market_insight = self._add_market_context(features)
         
         # Add personalized recommendations
-        personal_recs = self._get_personal_recommendations(query, user_profile)
+        personal_recs = self._get_personal_recommendations(features, user_profile)
         
         # Combine all advice
         full_advice = base_advice
@@ -313,388 +1176,111 @@ class FreeAIService:
         
         return full_advice
 
-    def _add_market_context(self, query: str) -> str:
+    def _add_market_context(self, features: QueryFeatures) -> str:
         """Add current market context to advice"""
-        query_lower = query.lower()
-        
-        if any(word in query_lower for word in ['invest', 'mutual fund', 'equity', 'stocks']):
-            return "Current market shows strong fundamentals in large-cap stocks. Nifty 50 has delivered consistent returns. SIP remains the best strategy for volatility management."
-        
-        elif any(word in query_lower for word in ['debt', 'bonds', 'fixed']):
-            return "Interest rates are stabilizing, making this a good time for debt investments. Government bonds offer 7-8% returns with safety."
-        
-        elif any(word in query_lower for word in ['gold', 'commodity']):
-            return "Gold prices are consolidating. Consider 5-10% allocation for portfolio diversification. Gold ETFs are more convenient than physical gold."
-        
-        elif any(word in query_lower for word in ['real estate', 'property', 'house']):
-            return "Real estate prices are showing steady growth in major cities. Home loan rates are attractive at 8-9%. Consider ready-to-move properties for immediate possession."
+        for keywords, insight in MARKET_INSIGHTS:
+            if keywords.search(features.lower):
+                return insight
         
         return ""
 
-    def _get_personal_recommendations(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+    def _get_personal_recommendations(self, features: QueryFeatures, user_profile: Dict[str, Any] = None) -> str:
         """Get personalized recommendations based on user profile"""
         if not user_profile:
             return ""
         
         income = user_profile.get('monthly_income', 0)
         age = user_profile.get('age', 30)
-        query_lower = query.lower()
-        
-        recommendations = []
-        
-        # Income-based recommendations
-        if income > 100000:
-            if 'invest' in query_lower:
-                recommendations.append("Consider portfolio management services (PMS) for amounts above ₹50L")
-            if 'tax' in query_lower:
-                recommendations.append("Explore NPS Tier 2 for additional tax benefits beyond ₹50K limit")
-        
-        elif income > 50000:
-            if 'invest' in query_lower:
-                recommendations.append("Perfect income level for diversified MF portfolio across large, mid, and small cap")
-            if 'goal' in query_lower:
-                recommendations.append("You can comfortably plan for multiple goals with systematic investment")
-        
-        else:
-            if 'invest' in query_lower:
-                recommendations.append("Start with large-cap funds and gradually add mid-cap as income grows")
-            recommendations.append("Focus on building emergency fund first before aggressive investments")
-        
-        # Age-based recommendations
-        if age < 30:
-            recommendations.append("Your young age allows for aggressive equity allocation (70-80%)")
-            if 'retirement' in query_lower:
-                recommendations.append("Starting retirement planning now can build a corpus of ₹5-10 crores by age 60")
-        
-        elif age < 45:
-            recommendations.append("Balanced approach: 60% equity, 40% debt allocation recommended")
-            if 'child' in query_lower:
-                recommendations.append("Education costs are rising 10-12% annually. Start planning immediately")
-        
-        else:
-            recommendations.append("Focus on wealth preservation with 40% equity, 60% debt allocation")
-            recommendations.append("Consider senior citizen saving schemes and health insurance priority")
-        
-        return " | ".join(recommendations) if recommendations else ""
+        income_tier = 2 if income > 100000 else 1 if income > 50000 else 0
+        age_band = 0 if age < 30 else 1 if age < 45 else 2
+        return _build_personal_recommendations(income_tier, age_band, features.flags & PERSONAL_RECOMMENDATION_FLAGS)
 
     def _get_market_context(self) -> Dict[str, str]:
         """Get current market context for response"""
-        return {
-            "equity_outlook": "Positive long-term outlook with periodic volatility",
-            "interest_rates": "Stable to declining trend, favorable for borrowers",
-            "inflation": "Controlled at 5-6%, manageable for financial planning",
-            "best_sectors": "Technology, Banking, Healthcare showing strong fundamentals"
-        }
+        return MARKET_CONTEXT
 
-    def _get_personalized_tips(self, user_profile: Dict[str, Any] = None) -> List[str]:
+    def _get_personalized_tips(self, user_profile: Dict[str, Any] = None) -> Sequence[str]:
         """Get personalized tips based on user profile"""
         if not user_profile:
-            return ["Start tracking expenses", "Build emergency fund", "Begin SIP investments"]
+            return DEFAULT_TIPS
         
         income = user_profile.get('monthly_income', 50000)
-        tips = []
-        
-        if income < 30000:
-            tips = [
-                "Use free investment apps for small SIPs",
-                "Maximize employer benefits (PF, insurance)",
-                "Focus on skill development for income growth"
-            ]
-        elif income < 100000:
-            tips = [
-                "Automate investments for discipline",
-                "Review and increase SIP annually",
-                "Consider term insurance for family protection"
-            ]
-        else:
-            tips = [
-                "Explore tax-efficient investment strategies",
-                "Consider professional financial planning",
-                "Look into alternative investments for diversification"
-            ]
-        
-        return tips
-        
-        if "child" in query or "education" in query:
-            context.append("Education inflation is 10-12% annually. For girl child, SSY offers 8% tax-free returns with compounding benefits.")
-        
-        if "sip" in query:
-            context.append("Start small and increase by 10-15% annually (step-up SIP). Use auto-debit on salary day for discipline.")
-        
-        if "reduce" in query and "expense" in query:
-            context.append("Use 50-30-20 rule: 50% needs, 30% wants, 20% savings. Track expenses for 30 days to identify leakages.")
-        
-        if "mutual fund" in query:
-            context.append("Choose direct plans over regular for lower expense ratios. Review portfolio annually, rebalance if needed.")
-        
-        if "home" in query or "house" in query:
-            context.append("Follow 40% EMI rule. Save 20% down payment separately. Consider location, connectivity, and builder reputation.")
-        
-        return " ".join(context)
+        return TIPS_BY_INCOME[0 if income < 30000 else 1 if income < 100000 else 2]
 
     def _format_ai_response(self, ai_text: str, original_query: str) -> str:
         """Format and clean AI response"""
         
-        # Remove query repetition if present
-        if original_query in ai_text:
-            ai_text = ai_text.replace(original_query, "").strip()
-        
-        # Clean up common AI artifacts
-        ai_text = ai_text.replace("Financial advice:", "").strip()
-        ai_text = ai_text.replace("AI:", "").strip()
-        ai_text = ai_text.replace("Response:", "").strip()
+        # Remove query repetition and common AI artifacts
+        ai_text = _response_cleanup_pattern(original_query).sub("", ai_text).strip()
         
         # Ensure it starts properly
         if not ai_text:
             return "I'd be happy to help with your financial question. Please provide more details."
         
         # Add Indian context if missing
-        if "₹" not in ai_text and "rupee" not in ai_text.lower() and "indian" not in ai_text.lower():
+        if not INDIAN_CONTEXT_RE.search(ai_text):
             ai_text += " Consider Indian options like PPF, ELSS, and mutual funds for your financial goals."
         
         return ai_text
 
-    def _get_template_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+    def _get_template_advice(self, features: QueryFeatures, user_profile: Dict[str, Any] = None) -> str:
         """Get advice using templates when AI services fail"""
-        
-        query_lower = query.lower()
         income = user_profile.get('monthly_income', 50000) if user_profile else 50000
-        
-        # Investment queries with detailed advice
-        if any(word in query_lower for word in ['invest', 'mutual fund', 'sip', 'stocks']):
-            monthly_investment = min(income * 0.2, 20000)  # 20% of income or max 20k
-            advice = f"For investing in India, start with ₹{monthly_investment:,.0f}/month SIP in diversified equity mutual funds. "
-            advice += "Allocation: 60% large-cap funds (stable growth), 30% mid-cap funds (higher growth), 10% international funds (diversification). "
-            advice += "ELSS funds offer tax benefits under Section 80C with 3-year lock-in. "
-            advice += f"Expected returns: 12-15% annually over 5+ years. Review and rebalance annually."
-            return advice
-        
-        # Savings queries with specific amounts
-        elif any(word in query_lower for word in ['save', 'emergency', 'fd', 'deposit']):
-            emergency_target = income * 6 * 0.7  # 6 months of 70% income
-            monthly_savings = min(income * 0.15, 15000)
-            advice = f"Build emergency fund of ₹{emergency_target:,.0f} (6 months expenses). "
-            advice += f"Save ₹{monthly_savings:,.0f}/month: 50% in high-yield savings (4-5%), 30% in liquid funds (4-6%), 20% in FDs (6-7%). "
-            advice += "PPF offers 7-8% tax-free returns for 15-year lock-in. Complete emergency fund first, then start PPF."
-            return advice
-        
-        # Goal planning with calculations
-        elif any(word in query_lower for word in ['goal', 'plan', 'house', 'car', 'retirement']):
-            if 'house' in query_lower:
-                max_emi = income * 0.4
-                loan_eligible = max_emi * 12 * 20  # 20 years
-                advice = f"For home purchase, max EMI should be ₹{max_emi:,.0f} (40% of income). "
-                advice += f"Eligible for loan: ₹{loan_eligible:,.0f}. Save 20% down payment separately in FDs/liquid funds. "
-                advice += "Get pre-approved loan for better negotiation. Consider location, connectivity, and resale value."
-            else:
-                advice = "Set SMART financial goals: Specific amount, Measurable progress, Achievable timeline, Relevant to life, Time-bound. "
-                advice += f"For goals, allocate ₹{income * 0.1:,.0f}/month and use SIP calculators to determine investment amount. "
-                advice += "Short-term goals (<3 years): Debt funds. Medium-term (3-7 years): Balanced funds. Long-term (>7 years): Equity funds."
-            return advice
-        
-        # Expense management with actionable steps
-        elif any(word in query_lower for word in ['expense', 'budget', 'spending', 'reduce']):
-            needs_budget = income * 0.5
-            wants_budget = income * 0.3
-            savings_budget = income * 0.2
-            advice = f"Follow 50-30-20 rule: Needs ₹{needs_budget:,.0f} (50%), Wants ₹{wants_budget:,.0f} (30%), Savings ₹{savings_budget:,.0f} (20%). "
-            advice += "Track expenses for 30 days using apps like Walnut/ET Money. "
-            advice += "Quick wins: Cancel unused subscriptions, cook more at home, use public transport, compare prices before big purchases. "
-            advice += "Review and optimize categories where spending exceeds 50% (needs) or 30% (wants)."
-            return advice
-        
-        # Tax planning with calculations
-        elif any(word in query_lower for word in ['tax', '80c', 'deduction']):
-            annual_income = income * 12
-            if annual_income > 500000:
-                tax_rate = "20-30%"
-                potential_savings = "₹45,000-60,000"
-            elif annual_income > 250000:
-                tax_rate = "5-20%"
-                potential_savings = "₹15,000-30,000"
-            else:
-                return "Your income is below taxable limit. Focus on building wealth through SIPs and emergency fund for future tax planning."
-            
-            advice = f"In {tax_rate} tax bracket, save {potential_savings} annually through: "
-            advice += "80C (₹1.5L): ELSS ₹8000/month, PPF ₹4500/month. "
-            advice += "80CCD(1B): NPS ₹4000/month (extra ₹50K deduction). "
-            advice += "80D: Health insurance ₹25K family, ₹50K parents. Plan investments by December for current financial year."
-            return advice
-        
-        # Insurance with coverage amounts
-        elif any(word in query_lower for word in ['insurance', 'term', 'health']):
-            term_coverage = income * 12 * 15  # 15x annual income
-            health_coverage = 500000 if income < 50000 else 1000000
-            advice = f"Essential insurance: Term life ₹{term_coverage:,.0f} (15x income), Health ₹{health_coverage:,.0f} family floater. "
-            advice += f"Term premium: ₹{income * 0.01:,.0f}/month approx. Health premium: ₹{income * 0.02:,.0f}/month. "
-            advice += "Buy pure insurance, avoid ULIPs for investment. Get early for lower premiums. Critical illness add-on recommended."
-            return advice
-        
-        # Default comprehensive response
-        else:
-            advice = f"Based on ₹{income:,.0f} monthly income, here's your financial roadmap: "
-            advice += f"1. Emergency fund: ₹{income * 4:,.0f} (6 months expenses) "
-            advice += f"2. Investments: ₹{income * 0.2:,.0f}/month SIP in equity MFs "
-            advice += f"3. Insurance: Term life + health coverage "
-            advice += f"4. Tax saving: ₹12,500/month in 80C instruments "
-            advice += "Start with emergency fund, then SIPs, ensure adequate insurance. I can help with specific areas - just ask!"
-            return advice
+        return _build_template_advice(_template_category(features.flags), income)
 
     def _get_enhanced_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
         """Get enhanced advice with better context and personality"""
         
-        query_lower = query.lower()
+        intents = _query_intents(query)
         
         # Handle greetings and casual conversation
-        if any(word in query_lower for word in ['hello', 'hi', 'hey', 'good morning', 'good evening']):
+        if "greeting" in intents:
             return self._get_greeting_response(user_profile)
         
-        if any(word in query_lower for word in ['how are you', 'what can you do', 'help me']):
+        if "capability" in intents:
             return self._get_capability_response(user_profile)
         
-        if any(word in query_lower for word in ['thank', 'thanks', 'great', 'awesome']):
+        if "appreciation" in intents:
             return self._get_appreciation_response()
         
         # Handle financial queries with enhanced context
-        return self._get_enhanced_financial_advice(query, user_profile)
+        return self._get_enhanced_financial_advice(query, user_profile, intents)
     
     def _get_greeting_response(self, user_profile: Dict[str, Any] = None) -> str:
         """Generate personalized greeting"""
         income = user_profile.get('monthly_income', 0) if user_profile else 0
         
-        greetings = [
-            f"Hello! I'm your AI financial advisor. Based on current market conditions, here's what I can help you with:",
-            f"Hi there! Welcome to FinVoice. I'm here to help you make smart financial decisions.",
-            f"Greetings! Let's work together to build your wealth and secure your financial future."
-        ]
-        
-        base_greeting = random.choice(greetings)
+        base_greeting = GREETINGS[random.randrange(len(GREETINGS))]
         
         if income > 0:
-            if income < 30000:
-                context = " I see you're starting your financial journey - let's focus on building a strong foundation with emergency funds and basic investments."
-            elif income < 100000:
-                context = f" With your ₹{income:,}/month income, we can create a balanced portfolio mixing growth and stability."
-            else:
-                context = f" Given your strong income of ₹{income:,}/month, we can explore advanced wealth-building strategies."
+            tier = bisect.bisect_right(GREETING_INCOME_LIMITS, income)
+            context = GREETING_INCOME_CONTEXTS[tier].format(income=income)
         else:
-            context = " I can help with investment planning, expense optimization, goal setting, tax planning, and much more!"
+            context = GREETING_DEFAULT_CONTEXT
         
         return base_greeting + context
     
-    def _get_capability_response(self, user_profile: Dict[str, Any] = None) -> str:
+    @staticmethod
+    def _get_capability_response(user_profile: Dict[str, Any] = None) -> str:
         """Explain chatbot capabilities"""
-        return """I'm your comprehensive financial advisor! Here's how I can help you:
-
-💰 **Investment Planning**: SIP recommendations, mutual fund selection, portfolio optimization
-📊 **Goal Setting**: Education planning, retirement corpus, home buying strategies  
-💳 **Expense Management**: Budget optimization, expense tracking, savings strategies
-🎯 **Tax Planning**: 80C optimization, NPS benefits, tax-saving investments
-🏦 **Insurance Planning**: Term life, health insurance, coverage calculations
-📈 **Market Insights**: Current opportunities, sector analysis, timing strategies
-
-I provide specific calculations, product recommendations, and actionable steps tailored to Indian markets. What would you like to explore today?"""
+        return CAPABILITY_RESPONSE
     
-    def _get_appreciation_response(self) -> str:
+    @staticmethod
+    def _get_appreciation_response() -> str:
         """Response to user appreciation"""
-        responses = [
-            "You're welcome! I'm always here to help you make informed financial decisions. Feel free to ask anything else!",
-            "Glad I could help! Building wealth is a journey, and I'm here to guide you every step of the way.",
-            "Happy to assist! Remember, consistent investing and smart planning are key to financial success. What else can I help with?"
-        ]
-        return random.choice(responses)
-    
-    def _get_enhanced_financial_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+        return APPRECIATION_RESPONSES[random.randrange(len(APPRECIATION_RESPONSES))]
+    
+    def _get_enhanced_financial_advice(self, query: str, user_profile: Dict[str, Any] = None,
+                                       intents: Optional[Set[str]] = None) -> str:
         """Enhanced financial advice with market context"""
-        query_lower = query.lower()
-        income = user_profile.get('monthly_income', 50000) if user_profile else 50000
-        
-        # Market context (you can update this with real data)
-        market_context = {
-            "nifty_trend": "bullish",
-            "interest_rates": "stable", 
-            "inflation": "6.2%",
-            "best_sectors": ["Technology", "Healthcare", "Financial Services"],
-            "fd_rates": "6.5-7%",
-            "mutual_fund_performance": "positive"
-        }
-        
-        # Enhanced investment advice
-        if any(word in query_lower for word in ['invest', 'sip', 'mutual fund', 'portfolio']):
-            monthly_investment = min(income * 0.2, 25000)
-            advice = f"🚀 **Investment Strategy for You:**\n\n"
-            advice += f"Based on your income and current market conditions (Nifty trending {market_context['nifty_trend']}), here's my recommendation:\n\n"
-            advice += f"💡 **Monthly SIP**: ₹{monthly_investment:,}\n"
-            advice += f"📊 **Allocation**: 60% Large Cap, 25% Mid Cap, 15% International\n"
-            advice += f"🎯 **Top Sectors**: {', '.join(market_context['best_sectors'])}\n"
-            advice += f"📈 **Expected Returns**: 12-15% annually\n\n"
-            advice += f"Start with blue-chip funds like HDFC Top 100 or ICICI Pru Bluechip, then add Mirae Asset Large Cap for diversification."
-            return advice
-        
-        # Enhanced savings advice  
-        elif any(word in query_lower for word in ['save', 'emergency', 'fd']):
-            emergency_amount = income * 6 * 0.7
-            advice = f"💰 **Smart Savings Strategy:**\n\n"
-            advice += f"🎯 **Emergency Fund Target**: ₹{emergency_amount:,} (6 months expenses)\n"
-            advice += f"🏦 **Current FD Rates**: {market_context['fd_rates']}\n"
-            advice += f"📊 **Optimal Mix**:\n"
-            advice += f"   • 40% High-yield Savings (instant access)\n"
-            advice += f"   • 35% Liquid Mutual Funds (1-day access)\n"
-            advice += f"   • 25% Short-term FDs (higher returns)\n\n"
-            advice += f"Consider banks like SBI, HDFC, or ICICI for best rates. Build this before investing!"
-            return advice
-            
-        # Enhanced goal planning
-        elif any(word in query_lower for word in ['goal', 'education', 'house', 'retirement']):
-            if 'house' in query_lower:
-                max_emi = income * 0.4
-                loan_amount = max_emi * 240  # 20 year loan
-                advice = f"🏠 **Home Buying Strategy:**\n\n"
-                advice += f"💳 **Max EMI Capacity**: ₹{max_emi:,}/month (40% rule)\n"
-                advice += f"🏦 **Loan Eligibility**: ₹{loan_amount:,}\n"
-                advice += f"💰 **Down Payment**: Save ₹{loan_amount * 0.2:,} separately\n"
-                advice += f"📊 **Current Home Loan Rates**: 8.5-9.5%\n\n"
-                advice += f"💡 **Pro Tips**: Get pre-approval, consider under-construction for better prices, check RERA registration!"
-            else:
-                advice = f"🎯 **Goal-Based Financial Planning:**\n\n"
-                advice += f"For systematic goal achievement:\n"
-                advice += f"• **Short-term (1-3 years)**: Debt funds, FDs\n"
-                advice += f"• **Medium-term (3-7 years)**: Balanced funds\n"
-                advice += f"• **Long-term (7+ years)**: Equity funds\n\n"
-                advice += f"Use SIP calculators to determine exact amounts. I can help with specific goal calculations!"
-            return advice
-            
-        # Enhanced expense management
-        elif any(word in query_lower for word in ['expense', 'budget', 'reduce', 'spending']):
-            needs_budget = income * 0.5
-            wants_budget = income * 0.3  
-            savings_budget = income * 0.2
-            advice = f"💳 **Smart Budget Optimization:**\n\n"
-            advice += f"📊 **50-30-20 Rule Applied**:\n"
-            advice += f"   🏠 Needs: ₹{needs_budget:,} (50%)\n"
-            advice += f"   🎯 Wants: ₹{wants_budget:,} (30%)\n"
-            advice += f"   💰 Savings: ₹{savings_budget:,} (20%)\n\n"
-            advice += f"💡 **Quick Savings Tips**:\n"
-            advice += f"• Cancel unused subscriptions\n"
-            advice += f"• Use cashback credit cards wisely\n"
-            advice += f"• Cook at home 5 days/week\n"
-            advice += f"• Review insurance annually for better rates"
-            return advice
-            
-        # Default enhanced response
-        else:
-            advice = f"🤖 **AI Financial Advisor at Your Service!**\n\n"
-            advice += f"I notice you're asking about financial planning. With current market conditions showing:\n"
-            advice += f"• Nifty: {market_context['nifty_trend']} trend\n"
-            advice += f"• Inflation: {market_context['inflation']}\n"
-            advice += f"• FD Rates: {market_context['fd_rates']}\n\n"
-            advice += f"💡 I can provide specific advice on:\n"
-            advice += f"📈 Investment strategies and fund selection\n"
-            advice += f"🎯 Goal-based financial planning\n"
-            advice += f"💰 Tax optimization strategies\n"
-            advice += f"📊 Portfolio rebalancing\n\n"
-            advice += f"What specific area would you like me to help you with?"
-            return advice
+        if intents is None:
+            intents = _query_intents(query)
+        income = int(user_profile.get('monthly_income', 50000) if user_profile else 50000)
+        
+        intent = next((name for name in ENHANCED_FINANCIAL_INTENTS if name in intents), None)
+        if intent == "goal" and "house" in intents:
+            intent = "house"
+        return _build_enhanced_financial_advice(intent, income)
     
     def _get_contextual_fallback_advice(self, query: str, user_profile: Dict[str, Any] = None) -> Dict[str, Any]:
         """Enhanced fallback advice with context"""
@@ -703,34 +1289,28 @@ I provide specific calculations, product recommendations, and actionable steps t
             "type": "text",
             "confidence": 0.8,
             "source": "contextual_fallback",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": self._fallback_timestamp()
         }
+    
+    def _fallback_timestamp(self) -> str:
+        """Current ISO timestamp, reformatted at most once per second"""
+        now = time.monotonic()
+        if now - self._timestamp_cache[0] >= FALLBACK_TIMESTAMP_RESOLUTION:
+            self._timestamp_cache = (now, datetime.now().isoformat())
+        return self._timestamp_cache[1]
 
-    async def get_portfolio_insights(self, portfolio_data: Dict[str, Any]) -> Dict[str, Any]:
+    def get_portfolio_insights(self, portfolio_data: Dict[str, Any]) -> Dict[str, Any]:
         """Get AI insights for portfolio"""
         try:
             total_value = portfolio_data.get('totalValue', 0)
             holdings_count = len(portfolio_data.get('holdings', []))
             today_change = portfolio_data.get('todayChangePercent', 0)
             
-            insights = []
-            
-            if total_value < 100000:
-                insights.append("Consider increasing your portfolio value through regular SIPs.")
-            elif total_value > 1000000:
-                insights.append("Good portfolio size! Focus on rebalancing and diversification.")
-            
-            if holdings_count < 3:
-                insights.append("Diversify your portfolio across more funds or sectors.")
-            elif holdings_count > 10:
-                insights.append("Consider consolidating holdings to reduce complexity.")
-            
-            if today_change > 2:
-                insights.append("Strong performance today! Stay disciplined and avoid overconfidence.")
-            elif today_change < -2:
-                insights.append("Market volatility is normal. Stick to your long-term plan.")
-            
-            advice = " ".join(insights) if insights else "Your portfolio looks balanced. Continue regular investing and review quarterly."
+            advice = " ".join(filter(None, (
+                _band_insight(total_value, PORTFOLIO_VALUE_INSIGHTS),
+                _band_insight(holdings_count, PORTFOLIO_HOLDINGS_INSIGHTS),
+                _band_insight(today_change, PORTFOLIO_CHANGE_INSIGHTS),
+            ))) or "Your portfolio looks balanced. Continue regular investing and review quarterly."
             
             return {
                 "advice": advice,
@@ -740,31 +1320,26 @@ I provide specific calculations, product recommendations, and actionable steps t
             }
             
         except Exception as e:
-            logger.error(f"Portfolio insights error: {e}")
+            logger.error("Portfolio insights error: %s", e)
             return {
                 "advice": "Regular portfolio review and rebalancing are key to long-term success.",
                 "type": "portfolio",
                 "confidence": 0.6
             }
 
-    async def get_expense_insights(self, expense_data: Dict[str, Any]) -> Dict[str, Any]:
+    def get_expense_insights(self, expense_data: Dict[str, Any]) -> Dict[str, Any]:
         """Get AI insights for expenses"""
         try:
             total_monthly = expense_data.get('totalMonthly', 0)
             categories = expense_data.get('categories', [])
             
-            insights = []
-            
-            if categories:
-                top_category = categories[0]
-                if top_category.get('percentage', 0) > 40:
-                    insights.append(f"Your {top_category['name']} expenses are quite high at {top_category['percentage']}%. Consider optimizing this category.")
+            top_category = categories[0] if categories else None
             
-            if total_monthly > 0:
-                insights.append("Track daily expenses using apps to identify savings opportunities.")
-                insights.append("Review recurring subscriptions and cancel unused ones.")
-            
-            advice = " ".join(insights) if insights else "Monitor expenses regularly and maintain a monthly budget for better financial control."
+            advice = " ".join(filter(None, (
+                f"Your {top_category['name']} expenses are quite high at {top_category['percentage']}%. Consider optimizing this category."
+                if top_category and top_category.get('percentage', 0) > 40 else None,
+                EXPENSE_TRACKING_INSIGHTS if total_monthly > 0 else None,
+            ))) or "Monitor expenses regularly and maintain a monthly budget for better financial control."
             
             return {
                 "advice": advice,
@@ -774,110 +1349,62 @@ I provide specific calculations, product recommendations, and actionable steps t
             }
             
         except Exception as e:
-            logger.error(f"Expense insights error: {e}")
+            logger.error("Expense insights error: %s", e)
             return {
                 "advice": "Regular expense tracking helps identify savings opportunities and maintain financial discipline.",
                 "type": "expense",
                 "confidence": 0.6
             }
 
-    def get_quick_tips(self, category: str) -> List[str]:
+    def get_quick_tips(self, category: str) -> Sequence[str]:
         """Get quick financial tips by category"""
-        tips = {
-            "investment": [
-                "Start SIP with just ₹500/month",
-                "Diversify across large, mid, and small cap funds",
-                "Stay invested for minimum 5 years",
-                "Don't time the market, invest regularly"
-            ],
-            "savings": [
-                "Automate savings on salary day",
-                "Keep emergency fund separate from investments",
-                "Use high-yield savings accounts",
-                "Save before you spend, not spend then save"
-            ],
-            "tax": [
-                "Invest ₹1.5L in 80C instruments",
-                "Consider NPS for extra ₹50K deduction",
-                "Plan investments by December",
-                "Keep all investment proofs organized"
-            ],
-            "budget": [
-                "Use 50-30-20 rule for allocation",
-                "Track every expense for one month",
-                "Set category-wise spending limits",
-                "Review and adjust monthly"
-            ]
-        }
-        
-        return tips.get(category, [
-            "Start your financial journey today",
-            "Consistency beats timing in investments",
-            "Emergency fund is your financial safety net",
-            "Invest regularly, review quarterly"
-        ])
+        return QUICK_TIPS.get(category, DEFAULT_QUICK_TIPS)
 
-    def _generate_education_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+    @staticmethod
+    def _generate_education_advice(query: str, user_profile: Dict[str, Any] = None) -> str:
         """Generate education planning advice"""
         income = user_profile.get('monthly_income', 50000) if user_profile else 50000
+        intents = _query_intents(query)
         
-        if 'girl' in query or 'daughter' in query:
+        if "girl_child" in intents:
             return f"For girl child education, use Sukanya Samriddhi Yojana offering 8% returns with tax benefits. Also start equity SIP of ₹{income * 0.1:,.0f}/month in diversified funds for higher education corpus."
         
-        if any(word in query for word in ['10 year', '15 year', 'long term']):
+        if "long_term" in intents:
             monthly_sip = income * 0.15
             return f"For long-term education planning, start SIP of ₹{monthly_sip:,.0f}/month in equity mutual funds. Mix of large-cap (60%) and mid-cap (40%) funds can potentially build ₹25-30 lakhs corpus in 15 years."
         
         return "For child's education, start early with Sukanya Samriddhi Yojana (for girls) and equity mutual fund SIPs. Plan for ₹20-30 lakhs for engineering/medical courses. Use step-up SIPs to increase investment with income growth."
 
-    def _generate_property_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+    @staticmethod
+    def _generate_property_advice(query: str, user_profile: Dict[str, Any] = None) -> str:
         """Generate property buying advice"""
         income = user_profile.get('monthly_income', 50000) if user_profile else 50000
-        
-        max_emi = income * 0.4  # 40% EMI rule
-        loan_amount = max_emi * 12 * 20  # 20 year loan assumption
-        
-        return f"For home buying, follow 40% EMI rule - max EMI ₹{max_emi:,.0f}/month. You can afford loan of ₹{loan_amount:,.0f}. Save 20% down payment separately. Consider under-construction projects for better prices. Use home loan for tax benefits under 80C and 24(b)."
+        return _property_advice(income)
 
-    def _generate_retirement_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+    @staticmethod
+    def _generate_retirement_advice(query: str, user_profile: Dict[str, Any] = None) -> str:
         """Generate retirement planning advice"""
         age = user_profile.get('age', 30) if user_profile else 30
         income = user_profile.get('monthly_income', 50000) if user_profile else 50000
-        
-        years_to_retire = 60 - age
-        retirement_corpus_needed = income * 12 * 25  # 25x annual income rule
-        
-        if years_to_retire > 20:
-            return f"Start retirement planning now! You need ₹{retirement_corpus_needed:,.0f} corpus. Invest ₹{income * 0.2:,.0f}/month in equity funds + ₹{income * 0.05:,.0f} in NPS for tax benefits. PPF and EPF are also excellent for retirement."
-        elif years_to_retire > 10:
-            return f"Accelerate retirement savings! Target ₹{retirement_corpus_needed:,.0f} corpus. Invest ₹{income * 0.3:,.0f}/month in balanced funds. Maximize NPS contribution for extra tax deduction."
-        else:
-            return "Focus on debt instruments and conservative hybrid funds. Ensure adequate health insurance. Consider senior citizen saving schemes post-retirement."
+        return _retirement_advice(age, income)
 
-    def _generate_tax_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+    @staticmethod
+    def _generate_tax_advice(query: str, user_profile: Dict[str, Any] = None) -> str:
         """Generate tax planning advice"""
         income = user_profile.get('monthly_income', 50000) if user_profile else 50000
         annual_income = income * 12
         
         if annual_income > 500000:
-            tax_bracket = "20-30%"
-            monthly_80c = 12500  # 1.5L annually
+            return TAX_BRACKET_ADVICE[2]
         elif annual_income > 250000:
-            tax_bracket = "5-20%"
-            monthly_80c = 8000
-        else:
-            return "Your income is below tax threshold. Focus on building emergency fund and starting small SIPs for future tax planning."
-        
-        return f"In {tax_bracket} tax bracket, save ₹{monthly_80c:,}/month in 80C instruments: ELSS (₹8000), PPF (₹4500). Add NPS ₹4000/month for extra ₹50K deduction. Total tax saving: ₹45,000-60,000 annually."
+            return TAX_BRACKET_ADVICE[1]
+        return TAX_BRACKET_ADVICE[0]
 
-    def _generate_emergency_fund_advice(self, query: str, user_profile: Dict[str, Any] = None) -> str:
+    @staticmethod
+    def _generate_emergency_fund_advice(query: str, user_profile: Dict[str, Any] = None) -> str:
         """Generate emergency fund advice"""
         income = user_profile.get('monthly_income', 50000) if user_profile else 50000
-        expenses = income * 0.7  # Assume 70% of income as expenses
-        
-        emergency_fund = expenses * 6  # 6 months expenses
-        
-        return f"Build emergency fund of ₹{emergency_fund:,.0f} (6 months expenses). Keep 50% in savings account, 30% in liquid mutual funds, 20% in short-term FDs. Start with ₹{income * 0.1:,.0f}/month allocation until target is reached."
+        return _emergency_fund_advice(income)
 
 # Create global instance
 free_ai_service = FreeAIService()
@@ -3,19 +3,23 @@ Goal Planner & Investment Recommender Service
 SIP planning and investment recommendations for Indian market
 """
 
+import asyncio
+import functools
 import json
 import logging
 import math
-from typing import Dict, List, Any, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
-import openai
 from decouple import config
-import pandas as pd
 import numpy as np
 
+if TYPE_CHECKING:
+    # Imported lazily at runtime; only the OpenAI client needs it
+    import openai
+
 logger = logging.getLogger(__name__)
 
 class GoalType(Enum):
@@ -28,6 +32,37 @@ class GoalType(Enum):
     EMERGENCY = "emergency"
     GENERAL = "general"
 
+# Goal types in declaration order, so per-type scores can live in arrays
+GOAL_TYPE_ORDINALS = {goal_type: ordinal for ordinal, goal_type in enumerate(GoalType)}
+
+# Importance score of each goal type, indexed by GOAL_TYPE_ORDINALS
+GOAL_IMPORTANCE = np.array([
+    0.7,   # HOUSE: Important
+    0.5,   # CAR: Moderate
+    0.8,   # EDUCATION: Important
+    0.6,   # WEDDING: Moderate
+    0.3,   # VACATION: Lower importance
+    0.9,   # RETIREMENT: Very important
+    1.0,   # EMERGENCY: Highest importance
+    0.4    # GENERAL: Variable
+])
+
+# Success probability adjustment of each goal type (some goals are more achievable)
+GOAL_SUCCESS_ADJUSTMENTS = np.array([
+    -0.05,  # HOUSE: Harder
+    0.05,   # CAR: Moderate
+    0.0,    # EDUCATION: Moderate
+    0.05,   # WEDDING: Moderate
+    0.1,    # VACATION: Easier
+    -0.1,   # RETIREMENT: Harder due to long timeline
+    0.1,    # EMERGENCY: Easier to achieve
+    0.0     # GENERAL: Neutral
+])
+
+# Base probability of success and priority score for each feasibility level
+FEASIBILITY_BASE_PROBABILITY = {"feasible": 0.85, "challenging": 0.65, "not_feasible": 0.35}
+FEASIBILITY_SCORES = {"feasible": 1.0, "challenging": 0.7, "not_feasible": 0.3}
+
 class RiskProfile(Enum):
     CONSERVATIVE = "conservative"
     MODERATE = "moderate"
@@ -46,6 +81,19 @@ class FinancialGoal:
     description: str
     is_flexible: bool  # Can target date be adjusted?
 
+@dataclass(frozen=True, slots=True)
+class ParsedProfile:
+    """The user profile fields goal analysis reads, parsed once per request"""
+    risk: RiskProfile
+    available: float
+    
+    @classmethod
+    def from_user_profile(cls, user_profile: Dict[str, Any]) -> "ParsedProfile":
+        return cls(
+            risk=RiskProfile(user_profile.get("risk_tolerance", "moderate")),
+            available=float(user_profile.get("available_for_investment", 0))
+        )
+
 @dataclass
 class SIPRecommendation:
     goal_id: str
@@ -61,6 +109,34 @@ class SIPRecommendation:
     min_sip: float
     lock_in_period: Optional[str]
 
+@dataclass(frozen=True, slots=True)
+class FundSpec:
+    id: str
+    name: str
+    type: str
+    fund_house: str
+    expense_ratio: float
+    min_sip: float
+    expected_return: float
+    risk: str
+    aum: str
+    lock_in: Optional[str]
+    category: str
+    tax_benefit: Optional[str] = None
+    # Values derived once from the fields above, read for every recommendation
+    score: float = field(init=False)  # Expected return net of expenses, used for ranking
+    is_reputed: bool = field(init=False)
+    is_elss: bool = field(init=False)
+    is_debt: bool = field(init=False)
+    is_equity: bool = field(init=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, "score", self.expected_return - self.expense_ratio)
+        object.__setattr__(self, "is_reputed", any(house in self.fund_house for house in REPUTED_FUND_HOUSES))
+        object.__setattr__(self, "is_elss", "elss" in self.type)
+        object.__setattr__(self, "is_debt", "debt" in self.type)
+        object.__setattr__(self, "is_equity", "equity" in self.type)
+
 @dataclass
 class GoalAnalysis:
     goal: FinancialGoal
@@ -72,12 +148,272 @@ class GoalAnalysis:
     recommended_funds: List[SIPRecommendation]
     probability_of_success: float
 
+# Fund houses called out as reputed in recommendation reasons
+REPUTED_FUND_HOUSES = ("HDFC", "ICICI", "SBI", "Axis", "UTI")
+
+# Popular Indian mutual funds (simplified), shared by every planner instance
+INDIAN_MUTUAL_FUNDS: Tuple[FundSpec, ...] = (
+    # Large Cap Equity Funds
+    FundSpec(
+        id="hdfc_top_100",
+        name="HDFC Top 100 Fund",
+        type="equity_large_cap",
+        fund_house="HDFC Mutual Fund",
+        expense_ratio=1.8,
+        min_sip=500,
+        expected_return=12.0,
+        risk="moderate",
+        aum="₹25,000 Cr",
+        lock_in=None,
+        category="Large Cap"
+    ),
+    FundSpec(
+        id="icici_bluechip",
+        name="ICICI Prudential Bluechip Fund",
+        type="equity_large_cap",
+        fund_house="ICICI Prudential MF",
+        expense_ratio=1.9,
+        min_sip=1000,
+        expected_return=11.8,
+        risk="moderate",
+        aum="₹30,000 Cr",
+        lock_in=None,
+        category="Large Cap"
+    ),
+
+    # Multi Cap Funds
+    FundSpec(
+        id="sbi_multi_cap",
+        name="SBI Multi Cap Fund",
+        type="equity_multi_cap",
+        fund_house="SBI Mutual Fund",
+        expense_ratio=1.7,
+        min_sip=500,
+        expected_return=13.0,
+        risk="moderate_high",
+        aum="₹15,000 Cr",
+        lock_in=None,
+        category="Multi Cap"
+    ),
+
+    # Mid Cap Funds
+    FundSpec(
+        id="hdfc_mid_cap",
+        name="HDFC Mid-Cap Opportunities Fund",
+        type="equity_mid_cap",
+        fund_house="HDFC Mutual Fund",
+        expense_ratio=2.0,
+        min_sip=500,
+        expected_return=14.5,
+        risk="high",
+        aum="₹18,000 Cr",
+        lock_in=None,
+        category="Mid Cap"
+    ),
+
+    # Small Cap Funds
+    FundSpec(
+        id="axis_small_cap",
+        name="Axis Small Cap Fund",
+        type="equity_small_cap",
+        fund_house="Axis Mutual Fund",
+        expense_ratio=2.1,
+        min_sip=500,
+        expected_return=16.0,
+        risk="very_high",
+        aum="₹12,000 Cr",
+        lock_in=None,
+        category="Small Cap"
+    ),
+
+    # ELSS Funds
+    FundSpec(
+        id="axis_long_term_equity",
+        name="Axis Long Term Equity Fund",
+        type="elss",
+        fund_house="Axis Mutual Fund",
+        expense_ratio=1.8,
+        min_sip=500,
+        expected_return=13.5,
+        risk="moderate_high",
+        aum="₹25,000 Cr",
+        lock_in="3 years",
+        category="ELSS",
+        tax_benefit="80C"
+    ),
+    FundSpec(
+        id="mirae_tax_saver",
+        name="Mirae Asset Tax Saver Fund",
+        type="elss",
+        fund_house="Mirae Asset MF",
+        expense_ratio=1.5,
+        min_sip=500,
+        expected_return=14.0,
+        risk="moderate_high",
+        aum="₹20,000 Cr",
+        lock_in="3 years",
+        category="ELSS",
+        tax_benefit="80C"
+    ),
+
+    # Debt Funds
+    FundSpec(
+        id="hdfc_short_term_debt",
+        name="HDFC Short Term Debt Fund",
+        type="debt_funds",
+        fund_house="HDFC Mutual Fund",
+        expense_ratio=1.2,
+        min_sip=1000,
+        expected_return=7.5,
+        risk="low",
+        aum="₹10,000 Cr",
+        lock_in=None,
+        category="Debt"
+    ),
+
+    # Hybrid Funds
+    FundSpec(
+        id="hdfc_balanced_advantage",
+        name="HDFC Balanced Advantage Fund",
+        type="hybrid_funds",
+        fund_house="HDFC Mutual Fund",
+        expense_ratio=1.6,
+        min_sip=500,
+        expected_return=10.5,
+        risk="moderate",
+        aum="₹35,000 Cr",
+        lock_in=None,
+        category="Hybrid"
+    ),
+
+    # Index Funds
+    FundSpec(
+        id="utm_nifty_50",
+        name="UTI Nifty 50 Index Fund",
+        type="index_funds",
+        fund_house="UTI Mutual Fund",
+        expense_ratio=0.2,
+        min_sip=500,
+        expected_return=11.5,
+        risk="moderate",
+        aum="₹8,000 Cr",
+        lock_in=None,
+        category="Index"
+    ),
+
+    # International Funds
+    FundSpec(
+        id="motilal_nasdaq_100",
+        name="Motilal Oswal NASDAQ 100 Fund",
+        type="international_funds",
+        fund_house="Motilal Oswal MF",
+        expense_ratio=1.9,
+        min_sip=500,
+        expected_return=11.0,
+        risk="high",
+        aum="₹5,000 Cr",
+        lock_in=None,
+        category="International"
+    )
+)
+
+# The same funds as parallel arrays, so category selection is a mask and an argmax
+FUND_TYPES = np.array([fund.type for fund in INDIAN_MUTUAL_FUNDS])
+FUND_MIN_SIP = np.array([fund.min_sip for fund in INDIAN_MUTUAL_FUNDS], dtype=float)
+FUND_SCORES = np.array([fund.score for fund in INDIAN_MUTUAL_FUNDS])
+
+# Risk-return mapping
+RISK_CATEGORIES = {
+    RiskProfile.CONSERVATIVE: ["debt_funds", "hybrid_funds", "equity_large_cap"],
+    RiskProfile.MODERATE: ["equity_large_cap", "equity_multi_cap", "hybrid_funds", "index_funds"],
+    RiskProfile.AGGRESSIVE: ["equity_mid_cap", "equity_small_cap", "equity_multi_cap", "international_funds"]
+}
+
+# Fund categories per risk profile, horizon bucket (<3, <7, 7-10, >10 years) and goal type;
+# the inputs take few enough values that every combination is computed once
+@functools.lru_cache(maxsize=None)
+def _fund_categories_for(risk_profile: RiskProfile, time_bucket: int, goal_type: GoalType) -> Tuple[str, ...]:
+    """Appropriate fund categories for a profile, horizon bucket and goal"""
+    
+    # Time-based selection
+    if time_bucket == 0:
+        # Short term: Conservative approach
+        categories = ["debt_funds", "hybrid_funds", "equity_large_cap"]
+    elif time_bucket == 1:
+        # Medium term: Balanced approach
+        categories = ["equity_large_cap", "hybrid_funds", "equity_multi_cap"]
+    else:
+        # Long term: Can take more risk
+        categories = ["equity_multi_cap", "equity_large_cap", "equity_mid_cap"]
+    
+    # Risk profile adjustment
+    risk_suitable = RISK_CATEGORIES[risk_profile]
+    categories = [cat for cat in categories if cat in risk_suitable]
+    
+    # Goal-specific adjustments
+    if goal_type == GoalType.RETIREMENT:
+        categories.insert(0, "elss")  # Tax saving benefit
+    elif goal_type == GoalType.EDUCATION and time_bucket == 3:
+        categories.insert(0, "equity_mid_cap")  # Higher growth potential
+    elif goal_type == GoalType.EMERGENCY:
+        categories = ["debt_funds", "hybrid_funds"]  # Safety first
+    
+    return tuple(categories)
+
+# Closed-form SIP math on plain floats, kept free of service state and profile lookups.
+# (1 + r)^n is evaluated as exp(n * log1p(r)), and (1 + r)^n - 1 as expm1(n * log1p(r)),
+# which stays accurate for small monthly rates
+def _future_value(present_value: float, months: float, annual_return: float) -> float:
+    """Future value of a lump sum compounded monthly"""
+    monthly_rate = annual_return / (12 * 100)
+    return present_value * math.exp(months * math.log1p(monthly_rate))
+
+def _required_sip(target_amount: float, current_amount: float, months: float, annual_return: float) -> float:
+    """Monthly SIP that grows the current amount to the target"""
+    
+    # Amount still needed
+    future_value_needed = target_amount - _future_value(current_amount, months, annual_return)
+    
+    if future_value_needed <= 0:
+        return 0  # Goal already achieved
+    
+    # Monthly return rate
+    monthly_rate = annual_return / (12 * 100)
+    
+    if monthly_rate == 0:
+        return future_value_needed / months
+    
+    # SIP calculation: FV = PMT * [((1 + r)^n - 1) / r]
+    # PMT = FV * r / ((1 + r)^n - 1)
+    sip_amount = future_value_needed * monthly_rate / math.expm1(months * math.log1p(monthly_rate))
+    
+    return max(500, sip_amount)  # Minimum SIP of ₹500
+
+def _projected_amount(current_amount: float, monthly_sip: float, months: float, annual_return: float) -> float:
+    """Final corpus from the current amount plus a monthly SIP"""
+    
+    # Future value of current amount
+    fv_current = _future_value(current_amount, months, annual_return)
+    
+    # Future value of SIP
+    monthly_rate = annual_return / (12 * 100)
+    if monthly_rate == 0:
+        fv_sip = monthly_sip * months
+    else:
+        fv_sip = monthly_sip * (math.expm1(months * math.log1p(monthly_rate)) / monthly_rate)
+    
+    return fv_current + fv_sip
+
+def _success_probability(base_probability: float, months: float, adjustment: float) -> float:
+    """Success probability scaled by time horizon and shifted by a goal-type adjustment"""
+    time_factor = min(1.0, months / 60)  # 5 years = optimal
+    base_probability *= (0.7 + 0.3 * time_factor)
+    return max(0.1, min(0.95, base_probability + adjustment))
+
 class GoalPlannerService:
     def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=config("OPENAI_API_KEY"))
-        
         # Indian mutual fund database (simplified)
-        self.indian_mutual_funds = self._load_indian_funds()
+        self.indian_mutual_funds = INDIAN_MUTUAL_FUNDS
         
         # Expected returns by asset class
         self.expected_returns = {
@@ -94,197 +430,56 @@ class GoalPlannerService:
         }
         
         # Risk-return mapping
-        self.risk_categories = {
-            RiskProfile.CONSERVATIVE: ["debt_funds", "hybrid_funds", "equity_large_cap"],
-            RiskProfile.MODERATE: ["equity_large_cap", "equity_multi_cap", "hybrid_funds", "index_funds"],
-            RiskProfile.AGGRESSIVE: ["equity_mid_cap", "equity_small_cap", "equity_multi_cap", "international_funds"]
-        }
+        self.risk_categories = RISK_CATEGORIES
     
-    def _load_indian_funds(self) -> Dict[str, Dict[str, Any]]:
-        """Load popular Indian mutual funds database"""
-        return {
-            # Large Cap Equity Funds
-            "hdfc_top_100": {
-                "name": "HDFC Top 100 Fund",
-                "type": "equity_large_cap",
-                "fund_house": "HDFC Mutual Fund",
-                "expense_ratio": 1.8,
-                "min_sip": 500,
-                "expected_return": 12.0,
-                "risk": "moderate",
-                "aum": "₹25,000 Cr",
-                "lock_in": None,
-                "category": "Large Cap"
-            },
-            "icici_bluechip": {
-                "name": "ICICI Prudential Bluechip Fund",
-                "type": "equity_large_cap",
-                "fund_house": "ICICI Prudential MF",
-                "expense_ratio": 1.9,
-                "min_sip": 1000,
-                "expected_return": 11.8,
-                "risk": "moderate",
-                "aum": "₹30,000 Cr",
-                "lock_in": None,
-                "category": "Large Cap"
-            },
-            
-            # Multi Cap Funds
-            "sbi_multi_cap": {
-                "name": "SBI Multi Cap Fund",
-                "type": "equity_multi_cap",
-                "fund_house": "SBI Mutual Fund",
-                "expense_ratio": 1.7,
-                "min_sip": 500,
-                "expected_return": 13.0,
-                "risk": "moderate_high",
-                "aum": "₹15,000 Cr",
-                "lock_in": None,
-                "category": "Multi Cap"
-            },
-            
-            # Mid Cap Funds
-            "hdfc_mid_cap": {
-                "name": "HDFC Mid-Cap Opportunities Fund",
-                "type": "equity_mid_cap",
-                "fund_house": "HDFC Mutual Fund",
-                "expense_ratio": 2.0,
-                "min_sip": 500,
-                "expected_return": 14.5,
-                "risk": "high",
-                "aum": "₹18,000 Cr",
-                "lock_in": None,
-                "category": "Mid Cap"
-            },
-            
-            # Small Cap Funds
-            "axis_small_cap": {
-                "name": "Axis Small Cap Fund",
-                "type": "equity_small_cap",
-                "fund_house": "Axis Mutual Fund",
-                "expense_ratio": 2.1,
-                "min_sip": 500,
-                "expected_return": 16.0,
-                "risk": "very_high",
-                "aum": "₹12,000 Cr",
-                "lock_in": None,
-                "category": "Small Cap"
-            },
-            
-            # ELSS Funds
-            "axis_long_term_equity": {
-                "name": "Axis Long Term Equity Fund",
-                "type": "elss",
-                "fund_house": "Axis Mutual Fund",
-                "expense_ratio": 1.8,
-                "min_sip": 500,
-                "expected_return": 13.5,
-                "risk": "moderate_high",
-                "aum": "₹25,000 Cr",
-                "lock_in": "3 years",
-                "category": "ELSS",
-                "tax_benefit": "80C"
-            },
-            "mirae_tax_saver": {
-                "name": "Mirae Asset Tax Saver Fund",
-                "type": "elss",
-                "fund_house": "Mirae Asset MF",
-                "expense_ratio": 1.5,
-                "min_sip": 500,
-                "expected_return": 14.0,
-                "risk": "moderate_high",
-                "aum": "₹20,000 Cr",
-                "lock_in": "3 years",
-                "category": "ELSS",
-                "tax_benefit": "80C"
-            },
-            
-            # Debt Funds
-            "hdfc_short_term_debt": {
-                "name": "HDFC Short Term Debt Fund",
-                "type": "debt_funds",
-                "fund_house": "HDFC Mutual Fund",
-                "expense_ratio": 1.2,
-                "min_sip": 1000,
-                "expected_return": 7.5,
-                "risk": "low",
-                "aum": "₹10,000 Cr",
-                "lock_in": None,
-                "category": "Debt"
-            },
-            
-            # Hybrid Funds
-            "hdfc_balanced_advantage": {
-                "name": "HDFC Balanced Advantage Fund",
-                "type": "hybrid_funds",
-                "fund_house": "HDFC Mutual Fund",
-                "expense_ratio": 1.6,
-                "min_sip": 500,
-                "expected_return": 10.5,
-                "risk": "moderate",
-                "aum": "₹35,000 Cr",
-                "lock_in": None,
-                "category": "Hybrid"
-            },
-            
-            # Index Funds
-            "utm_nifty_50": {
-                "name": "UTI Nifty 50 Index Fund",
-                "type": "index_funds",
-                "fund_house": "UTI Mutual Fund",
-                "expense_ratio": 0.2,
-                "min_sip": 500,
-                "expected_return": 11.5,
-                "risk": "moderate",
-                "aum": "₹8,000 Cr",
-                "lock_in": None,
-                "category": "Index"
-            },
-            
-            # International Funds
-            "motilal_nasdaq_100": {
-                "name": "Motilal Oswal NASDAQ 100 Fund",
-                "type": "international_funds",
-                "fund_house": "Motilal Oswal MF",
-                "expense_ratio": 1.9,
-                "min_sip": 500,
-                "expected_return": 11.0,
-                "risk": "high",
-                "aum": "₹5,000 Cr",
-                "lock_in": None,
-                "category": "International"
-            }
-        }
+    @functools.cached_property
+    def openai_client(self) -> "openai.OpenAI":
+        """OpenAI client, created on first use"""
+        import openai
+        
+        return openai.OpenAI(api_key=config("OPENAI_API_KEY"))
     
     async def analyze_goal(
         self, 
         goal: FinancialGoal, 
-        user_profile: Dict[str, Any]
+        user_profile: Dict[str, Any],
+        months_to_goal: Optional[float] = None,
+        required_sip: Optional[float] = None,
+        profile: Optional[ParsedProfile] = None
     ) -> GoalAnalysis:
         """Analyze a financial goal and provide recommendations"""
         
         try:
+            if profile is None:
+                profile = ParsedProfile.from_user_profile(user_profile)
+            
             # Calculate time to goal
-            months_to_goal = self._calculate_months_to_goal(goal.target_date)
+            if months_to_goal is None:
+                months_to_goal = self._calculate_months_to_goal(goal.target_date)
+            
+            # Goals the current amount already covers (at the return the required SIP assumes)
+            # need no fund selection or strategy planning
+            fv_current = self._calculate_future_value(goal.current_amount, months_to_goal, 12.0)
+            if fv_current >= goal.target_amount:
+                return self._funded_goal_analysis(goal, fv_current)
             
             # Calculate required SIP amount
-            required_sip = self._calculate_required_sip(
-                goal.target_amount, 
-                goal.current_amount, 
-                months_to_goal
-            )
+            if required_sip is None:
+                required_sip = self._calculate_required_sip(
+                    goal.target_amount, 
+                    goal.current_amount, 
+                    months_to_goal
+                )
             
             # Assess feasibility
-            feasibility = self._assess_goal_feasibility(
-                required_sip, 
-                user_profile.get("available_for_investment", 0)
-            )
+            feasibility = self._assess_goal_feasibility(required_sip, profile.available)
             
             # Get fund recommendations
             recommended_funds = await self._recommend_funds_for_goal(
                 goal, 
-                user_profile, 
-                required_sip
+                profile, 
+                required_sip,
+                months_to_goal
             )
             
             # Calculate projected amounts
@@ -292,7 +487,7 @@ class GoalPlannerService:
                 goal.current_amount,
                 goal.monthly_contribution or required_sip,
                 months_to_goal,
-                self._get_expected_return_for_goal(goal, user_profile)
+                self._get_expected_return_for_goal(goal, profile, months_to_goal)
             )
             
             # Calculate shortfall
@@ -340,31 +535,35 @@ class GoalPlannerService:
         expected_return: float = 12.0
     ) -> float:
         """Calculate required monthly SIP amount"""
+        return _required_sip(target_amount, current_amount, months, expected_return)
+    
+    def _calculate_required_sips(
+        self,
+        target_amounts: np.ndarray,
+        current_amounts: np.ndarray,
+        months: np.ndarray,
+        expected_return: float = 12.0
+    ) -> np.ndarray:
+        """Calculate required monthly SIP amounts for several goals at once"""
         
-        # Amount still needed
-        future_value_needed = target_amount - self._calculate_future_value(
-            current_amount, months, expected_return
-        )
-        
-        if future_value_needed <= 0:
-            return 0  # Goal already achieved
-        
-        # Monthly return rate
         monthly_rate = expected_return / (12 * 100)
+        log_growth = months * np.log1p(monthly_rate)
         
-        if monthly_rate == 0:
-            return future_value_needed / months
+        # Amount still needed; goals already achieved need no SIP
+        future_value_needed = target_amounts - current_amounts * np.exp(log_growth)
         
-        # SIP calculation: FV = PMT * [((1 + r)^n - 1) / r]
-        # PMT = FV * r / ((1 + r)^n - 1)
-        sip_amount = future_value_needed * monthly_rate / ((1 + monthly_rate) ** months - 1)
+        # Goals with zero months left divide by zero and come out non-finite, for the caller to handle
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if monthly_rate == 0:
+                sip_amounts = future_value_needed / months
+            else:
+                sip_amounts = np.maximum(500, future_value_needed * monthly_rate / np.expm1(log_growth))  # Minimum SIP of ₹500
         
-        return max(500, sip_amount)  # Minimum SIP of ₹500
+        return np.where(future_value_needed > 0, sip_amounts, 0.0)
     
     def _calculate_future_value(self, present_value: float, months: float, annual_return: float) -> float:
         """Calculate future value of current amount"""
-        monthly_rate = annual_return / (12 * 100)
-        return present_value * ((1 + monthly_rate) ** months)
+        return _future_value(present_value, months, annual_return)
     
     def _calculate_projected_amount(
         self, 
@@ -374,18 +573,7 @@ class GoalPlannerService:
         annual_return: float
     ) -> float:
         """Calculate projected final amount"""
-        
-        # Future value of current amount
-        fv_current = self._calculate_future_value(current_amount, months, annual_return)
-        
-        # Future value of SIP
-        monthly_rate = annual_return / (12 * 100)
-        if monthly_rate == 0:
-            fv_sip = monthly_sip * months
-        else:
-            fv_sip = monthly_sip * (((1 + monthly_rate) ** months - 1) / monthly_rate)
-        
-        return fv_current + fv_sip
+        return _projected_amount(current_amount, monthly_sip, months, annual_return)
     
     def _assess_goal_feasibility(self, required_sip: float, available_amount: float) -> str:
         """Assess if goal is feasible based on available investment amount"""
@@ -397,21 +585,28 @@ class GoalPlannerService:
         else:
             return "not_feasible"
     
-    def _get_expected_return_for_goal(self, goal: FinancialGoal, user_profile: Dict[str, Any]) -> float:
+    def _get_expected_return_for_goal(
+        self, 
+        goal: FinancialGoal, 
+        profile: ParsedProfile,
+        months_to_goal: Optional[float] = None
+    ) -> float:
         """Get expected return based on goal type and user profile"""
         
-        risk_tolerance = user_profile.get("risk_tolerance", "moderate")
-        time_horizon = self._calculate_months_to_goal(goal.target_date) / 12  # years
+        risk_tolerance = profile.risk
+        if months_to_goal is None:
+            months_to_goal = self._calculate_months_to_goal(goal.target_date)
+        time_horizon = months_to_goal / 12  # years
         
         # Conservative approach for short-term goals
         if time_horizon < 3:
             return 8.0  # Debt funds and conservative hybrid
         elif time_horizon < 7:
-            return 10.0 if risk_tolerance == "conservative" else 12.0
+            return 10.0 if risk_tolerance == RiskProfile.CONSERVATIVE else 12.0
         else:
-            if risk_tolerance == "conservative":
+            if risk_tolerance == RiskProfile.CONSERVATIVE:
                 return 10.0
-            elif risk_tolerance == "aggressive":
+            elif risk_tolerance == RiskProfile.AGGRESSIVE:
                 return 14.0
             else:
                 return 12.0
@@ -419,13 +614,16 @@ class GoalPlannerService:
     async def _recommend_funds_for_goal(
         self, 
         goal: FinancialGoal, 
-        user_profile: Dict[str, Any], 
-        required_sip: float
+        profile: ParsedProfile, 
+        required_sip: float,
+        months_to_goal: Optional[float] = None
     ) -> List[SIPRecommendation]:
         """Recommend mutual funds for the goal"""
         
-        risk_tolerance = RiskProfile(user_profile.get("risk_tolerance", "moderate"))
-        time_horizon = self._calculate_months_to_goal(goal.target_date) / 12
+        risk_tolerance = profile.risk
+        if months_to_goal is None:
+            months_to_goal = self._calculate_months_to_goal(goal.target_date)
+        time_horizon = months_to_goal / 12
         
         # Select appropriate fund categories
         suitable_categories = self._select_fund_categories(risk_tolerance, time_horizon, goal.goal_type)
@@ -436,7 +634,7 @@ class GoalPlannerService:
             best_fund = self._select_best_fund_in_category(category, required_sip)
             if best_fund:
                 recommendation = self._create_sip_recommendation(
-                    goal, best_fund, required_sip, category
+                    goal, best_fund, required_sip, category, months_to_goal
                 )
                 recommendations.append(recommendation)
         
@@ -450,118 +648,103 @@ class GoalPlannerService:
     ) -> List[str]:
         """Select appropriate fund categories based on profile and goal"""
         
-        categories = []
-        
-        # Time-based selection
+        # Only these horizon boundaries change the selection
         if time_horizon < 3:
-            # Short term: Conservative approach
-            categories = ["debt_funds", "hybrid_funds", "equity_large_cap"]
+            time_bucket = 0
         elif time_horizon < 7:
-            # Medium term: Balanced approach
-            categories = ["equity_large_cap", "hybrid_funds", "equity_multi_cap"]
+            time_bucket = 1
+        elif time_horizon <= 10:
+            time_bucket = 2
         else:
-            # Long term: Can take more risk
-            categories = ["equity_multi_cap", "equity_large_cap", "equity_mid_cap"]
+            time_bucket = 3
         
-        # Risk profile adjustment
-        risk_suitable = self.risk_categories[risk_profile]
-        categories = [cat for cat in categories if cat in risk_suitable]
-        
-        # Goal-specific adjustments
-        if goal_type == GoalType.RETIREMENT:
-            categories.insert(0, "elss")  # Tax saving benefit
-        elif goal_type == GoalType.EDUCATION and time_horizon > 10:
-            categories.insert(0, "equity_mid_cap")  # Higher growth potential
-        elif goal_type == GoalType.EMERGENCY:
-            categories = ["debt_funds", "hybrid_funds"]  # Safety first
-        
-        return categories
+        return list(_fund_categories_for(risk_profile, time_bucket, goal_type))
     
-    def _select_best_fund_in_category(self, category: str, required_sip: float) -> Optional[Dict[str, Any]]:
+    def _select_best_fund_in_category(self, category: str, required_sip: float) -> Optional[FundSpec]:
         """Select the best fund in a given category"""
         
-        suitable_funds = [
-            (fund_id, fund_data) for fund_id, fund_data in self.indian_mutual_funds.items()
-            if fund_data["type"] == category and fund_data["min_sip"] <= required_sip
-        ]
+        in_category = FUND_TYPES == category
+        if not in_category.any():
+            return None
         
-        if not suitable_funds:
+        suitable_funds = in_category & (FUND_MIN_SIP <= required_sip)
+        if not suitable_funds.any():
             # Fallback: find funds with lower minimum SIP
-            suitable_funds = [
-                (fund_id, fund_data) for fund_id, fund_data in self.indian_mutual_funds.items()
-                if fund_data["type"] == category
-            ]
-        
-        if suitable_funds:
-            # Select based on expected return and expense ratio
-            best_fund = max(
-                suitable_funds,
-                key=lambda x: x[1]["expected_return"] - x[1]["expense_ratio"]
-            )
-            return {"id": best_fund[0], **best_fund[1]}
+            suitable_funds = in_category
         
-        return None
+        # Select based on expected return and expense ratio
+        best_index = int(np.argmax(np.where(suitable_funds, FUND_SCORES, -np.inf)))
+        return INDIAN_MUTUAL_FUNDS[best_index]
     
     def _create_sip_recommendation(
         self, 
         goal: FinancialGoal, 
-        fund: Dict[str, Any], 
+        fund: FundSpec, 
         required_sip: float, 
-        category: str
+        category: str,
+        months_to_goal: Optional[float] = None
     ) -> SIPRecommendation:
         """Create SIP recommendation object"""
         
         # Adjust recommended amount based on fund minimum
-        recommended_amount = max(fund["min_sip"], required_sip / 3)  # Divide among 3 funds
+        recommended_amount = max(fund.min_sip, required_sip / 3)  # Divide among 3 funds
         
         # Generate recommendation reason
-        why_recommended = self._generate_recommendation_reason(fund, goal, category)
+        why_recommended = self._generate_recommendation_reason(fund, goal, category, months_to_goal)
         
         return SIPRecommendation(
             goal_id=goal.id,
-            fund_name=fund["name"],
-            fund_type=fund["category"],
+            fund_name=fund.name,
+            fund_type=fund.category,
             recommended_amount=recommended_amount,
-            expected_return=fund["expected_return"],
-            risk_level=fund["risk"],
+            expected_return=fund.expected_return,
+            risk_level=fund.risk,
             fund_category=category,
             why_recommended=why_recommended,
-            expense_ratio=fund["expense_ratio"],
-            fund_house=fund["fund_house"],
-            min_sip=fund["min_sip"],
-            lock_in_period=fund.get("lock_in")
+            expense_ratio=fund.expense_ratio,
+            fund_house=fund.fund_house,
+            min_sip=fund.min_sip,
+            lock_in_period=fund.lock_in
         )
     
-    def _generate_recommendation_reason(self, fund: Dict[str, Any], goal: FinancialGoal, category: str) -> str:
+    def _generate_recommendation_reason(
+        self, 
+        fund: FundSpec, 
+        goal: FinancialGoal, 
+        category: str,
+        months_to_goal: Optional[float] = None
+    ) -> str:
         """Generate explanation for why this fund is recommended"""
         
         reasons = []
         
         # Performance reason
-        if fund["expected_return"] > 12:
-            reasons.append(f"High growth potential ({fund['expected_return']}% expected return)")
-        elif fund["expected_return"] > 8:
-            reasons.append(f"Balanced growth approach ({fund['expected_return']}% expected return)")
+        if fund.expected_return > 12:
+            reasons.append(f"High growth potential ({fund.expected_return}% expected return)")
+        elif fund.expected_return > 8:
+            reasons.append(f"Balanced growth approach ({fund.expected_return}% expected return)")
         else:
-            reasons.append(f"Stable returns with lower risk ({fund['expected_return']}% expected return)")
+            reasons.append(f"Stable returns with lower risk ({fund.expected_return}% expected return)")
         
         # Cost efficiency
-        if fund["expense_ratio"] < 1.5:
+        if fund.expense_ratio < 1.5:
             reasons.append("Low expense ratio")
         
         # Fund house reputation
-        reputed_houses = ["HDFC", "ICICI", "SBI", "Axis", "UTI"]
-        if any(house in fund["fund_house"] for house in reputed_houses):
+        if fund.is_reputed:
             reasons.append("Reputed fund house")
         
         # Goal-specific reasons
-        time_horizon = self._calculate_months_to_goal(goal.target_date) / 12
+        if months_to_goal is None:
+            months_to_goal = self._calculate_months_to_goal(goal.target_date)
+        time_horizon = months_to_goal / 12
         
-        if goal.goal_type == GoalType.RETIREMENT and "elss" in category:
+        # The fund's type is the category it was selected for
+        if goal.goal_type == GoalType.RETIREMENT and fund.is_elss:
             reasons.append("Tax saving benefit under 80C")
-        elif time_horizon < 3 and "debt" in category:
+        elif time_horizon < 3 and fund.is_debt:
             reasons.append("Suitable for short-term goals")
-        elif time_horizon > 7 and "equity" in category:
+        elif time_horizon > 7 and fund.is_equity:
             reasons.append("Long-term wealth creation potential")
         
         return "; ".join(reasons[:3])  # Limit to 3 reasons
@@ -617,32 +800,27 @@ class GoalPlannerService:
     ) -> float:
         """Calculate probability of achieving the goal"""
         
-        base_probability = {
-            "feasible": 0.85,
-            "challenging": 0.65,
-            "not_feasible": 0.35
-        }[feasibility]
-        
-        # Adjust based on time horizon
-        time_factor = min(1.0, months_to_goal / 60)  # 5 years = optimal
-        base_probability *= (0.7 + 0.3 * time_factor)
-        
-        # Adjust based on goal type (some goals are more achievable)
-        goal_adjustments = {
-            GoalType.EMERGENCY: 0.1,      # Easier to achieve
-            GoalType.CAR: 0.05,           # Moderate
-            GoalType.VACATION: 0.1,       # Easier
-            GoalType.EDUCATION: 0.0,      # Moderate
-            GoalType.HOUSE: -0.05,        # Harder
-            GoalType.RETIREMENT: -0.1,    # Harder due to long timeline
-            GoalType.WEDDING: 0.05,       # Moderate
-            GoalType.GENERAL: 0.0         # Neutral
-        }
+        base_probability = FEASIBILITY_BASE_PROBABILITY[feasibility]
         
-        adjustment = goal_adjustments.get(goal_type, 0.0)
-        final_probability = max(0.1, min(0.95, base_probability + adjustment))
-        
-        return final_probability
+        # Adjust based on time horizon and goal type
+        ordinal = GOAL_TYPE_ORDINALS.get(goal_type)
+        adjustment = 0.0 if ordinal is None else float(GOAL_SUCCESS_ADJUSTMENTS[ordinal])
+        return _success_probability(base_probability, months_to_goal, adjustment)
+    
+    def _funded_goal_analysis(self, goal: FinancialGoal, projected_amount: float) -> GoalAnalysis:
+        """Return goal analysis for a goal the current amount already funds"""
+        return GoalAnalysis(
+            goal=goal,
+            feasibility="feasible",
+            required_monthly_sip=0.0,
+            projected_final_amount=projected_amount,
+            shortfall_amount=0.0,
+            alternative_strategies=[
+                "Goal already funded — consider reallocating SIP to other goals"
+            ],
+            recommended_funds=[],
+            probability_of_success=0.98
+        )
     
     def _default_goal_analysis(self, goal: FinancialGoal) -> GoalAnalysis:
         """Return default goal analysis for error cases"""
@@ -670,17 +848,21 @@ class GoalPlannerService:
         
         try:
             # Analyze each goal
-            goal_analyses = []
-            for goal in goals:
-                analysis = await self.analyze_goal(goal, user_profile)
-                goal_analyses.append(analysis)
+            months_to_goals = np.fromiter(
+                (self._calculate_months_to_goal(goal.target_date) for goal in goals), dtype=float, count=len(goals)
+            )
+            try:
+                profile = ParsedProfile.from_user_profile(user_profile)
+            except (TypeError, ValueError):
+                profile = None  # Each goal reports the bad profile through its default analysis
+            goal_analyses = await self._analyze_goals_batch(goals, user_profile, months_to_goals, profile)
             
             # Calculate total investment required
             total_required_sip = sum(analysis.required_monthly_sip for analysis in goal_analyses)
             available_amount = user_profile.get("available_for_investment", 0)
             
             # Prioritize goals
-            prioritized_goals = self._prioritize_goals(goal_analyses, available_amount)
+            prioritized_goals = self._prioritize_goals(goal_analyses, available_amount, months_to_goals.tolist())
             
             # Generate allocation strategy
             allocation_strategy = self._generate_allocation_strategy(prioritized_goals, available_amount)
@@ -702,62 +884,87 @@ class GoalPlannerService:
             logger.error(f"Error generating comprehensive goal plan: {e}")
             return {"error": str(e)}
     
-    def _prioritize_goals(self, goal_analyses: List[GoalAnalysis], available_amount: float) -> List[Dict[str, Any]]:
+    async def _analyze_goals_batch(
+        self, 
+        goals: List[FinancialGoal], 
+        user_profile: Dict[str, Any],
+        months: np.ndarray,
+        profile: Optional[ParsedProfile] = None
+    ) -> List[GoalAnalysis]:
+        """Analyze several goals, computing their required SIPs in one vectorized pass"""
+        
+        count = len(goals)
+        required_sips = self._calculate_required_sips(
+            np.fromiter((goal.target_amount for goal in goals), dtype=float, count=count),
+            np.fromiter((goal.current_amount for goal in goals), dtype=float, count=count),
+            months
+        )
+        
+        # A goal due within a day has no months to spread a SIP over; like the scalar path,
+        # which divides by zero there, it gets the default analysis
+        priced = np.isfinite(required_sips).tolist()
+        
+        # Goals are independent, so their analyses run concurrently
+        analyses = iter(await asyncio.gather(
+            *(
+                self.analyze_goal(goal, user_profile, months_to_goal, required_sip, profile)
+                for goal, months_to_goal, required_sip, is_priced in zip(
+                    goals, months.tolist(), required_sips.tolist(), priced
+                )
+                if is_priced
+            ),
+            return_exceptions=True
+        ))
+        
+        results = []
+        for goal, is_priced in zip(goals, priced):
+            analysis = next(analyses) if is_priced else None
+            if analysis is None or isinstance(analysis, Exception):
+                analysis = self._default_goal_analysis(goal)
+            results.append(analysis)
+        return results
+    
+    def _prioritize_goals(
+        self, 
+        goal_analyses: List[GoalAnalysis], 
+        available_amount: float,
+        months_to_goals: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
         """Prioritize goals based on urgency, feasibility, and importance"""
         
-        prioritized = []
+        count = len(goal_analyses)
+        if months_to_goals is None:
+            months_to_goals = [self._calculate_months_to_goal(analysis.goal.target_date) for analysis in goal_analyses]
+        months = np.asarray(months_to_goals, dtype=float)
         
-        for analysis in goal_analyses:
-            goal = analysis.goal
-            
-            # Calculate priority score
-            urgency_score = self._calculate_urgency_score(goal.target_date)
-            importance_score = self._calculate_importance_score(goal.goal_type)
-            feasibility_score = {"feasible": 1.0, "challenging": 0.7, "not_feasible": 0.3}[analysis.feasibility]
-            
-            overall_score = (urgency_score * 0.4 + importance_score * 0.3 + feasibility_score * 0.3)
-            
-            prioritized.append({
-                "goal": goal,
-                "analysis": analysis,
-                "priority_score": overall_score,
-                "recommended_allocation": min(analysis.required_monthly_sip, available_amount * 0.4)
-            })
-        
-        # Sort by priority score
-        prioritized.sort(key=lambda x: x["priority_score"], reverse=True)
-        
-        return prioritized
-    
-    def _calculate_urgency_score(self, target_date: datetime) -> float:
-        """Calculate urgency score based on target date"""
-        months_to_goal = self._calculate_months_to_goal(target_date)
-        
-        if months_to_goal < 12:
-            return 1.0  # Very urgent
-        elif months_to_goal < 36:
-            return 0.8  # Urgent
-        elif months_to_goal < 60:
-            return 0.6  # Moderate
-        elif months_to_goal < 120:
-            return 0.4  # Low urgency
-        else:
-            return 0.2  # Very low urgency
-    
-    def _calculate_importance_score(self, goal_type: GoalType) -> float:
-        """Calculate importance score based on goal type"""
-        importance_mapping = {
-            GoalType.EMERGENCY: 1.0,      # Highest importance
-            GoalType.RETIREMENT: 0.9,     # Very important
-            GoalType.EDUCATION: 0.8,      # Important
-            GoalType.HOUSE: 0.7,          # Important
-            GoalType.WEDDING: 0.6,        # Moderate
-            GoalType.CAR: 0.5,            # Moderate
-            GoalType.VACATION: 0.3,       # Lower importance
-            GoalType.GENERAL: 0.4         # Variable
-        }
+        # Calculate priority scores for all goals at once
+        urgency_scores = np.select(
+            [months < 12, months < 36, months < 60, months < 120],
+            [1.0, 0.8, 0.6, 0.4],  # Very urgent down to low urgency
+            default=0.2  # Very low urgency
+        )
+        ordinals = np.fromiter(
+            (GOAL_TYPE_ORDINALS.get(analysis.goal.goal_type, -1) for analysis in goal_analyses), dtype=int, count=count
+        )
+        importance_scores = np.where(ordinals >= 0, GOAL_IMPORTANCE[ordinals], 0.5)
+        feasibility_scores = np.fromiter(
+            (FEASIBILITY_SCORES[analysis.feasibility] for analysis in goal_analyses), dtype=float, count=count
+        )
+        
+        overall_scores = urgency_scores * 0.4 + importance_scores * 0.3 + feasibility_scores * 0.3
+        
+        # Highest priority first; a stable sort keeps equal scores in their original order
+        order = np.argsort(-overall_scores, kind="stable")
         
-        return importance_mapping.get(goal_type, 0.5)
+        return [
+            {
+                "goal": goal_analyses[index].goal,
+                "analysis": goal_analyses[index],
+                "priority_score": overall_score,
+                "recommended_allocation": min(goal_analyses[index].required_monthly_sip, available_amount * 0.4)
+            }
+            for index, overall_score in zip(order.tolist(), overall_scores[order].tolist())
+        ]
     
     def _generate_allocation_strategy(self, prioritized_goals: List[Dict[str, Any]], available_amount: float) -> Dict[str, Any]:
         """Generate investment allocation strategy across goals"""
@@ -19,6 +19,7 @@ class MarketDataService:
         }
         self.cache = {}
         self.cache_duration = 300  # 5 minutes
+        self._inflight: Dict[str, asyncio.Future] = {}
     
     async def get_current_market_data(self) -> Dict[str, Any]:
         """Get current market data including indices, forex, commodities"""
@@ -28,6 +29,12 @@ class MarketDataService:
         if self._is_cached(cache_key):
             return self.cache[cache_key]['data']
         
+        return await self._fetch_once(cache_key, self._fetch_market_data)
+    
+    async def _fetch_market_data(self) -> Dict[str, Any]:
+        """Fetch market data and cache it"""
+        cache_key = "market_data"
+        
         try:
             # In production, this would fetch from real APIs
             # For demo purposes, using mock data
@@ -88,6 +95,12 @@ class MarketDataService:
         if self._is_cached(cache_key):
             return self.cache[cache_key]['data']
         
+        return await self._fetch_once(cache_key, self._fetch_news_analysis)
+    
+    async def _fetch_news_analysis(self) -> Dict[str, Any]:
+        """Run the news analysis and cache it"""
+        cache_key = "news_analysis"
+        
         try:
             # In production, this would use real news APIs and NLP
             # Mock analysis for demo
@@ -288,6 +301,16 @@ class MarketDataService:
         cache_age = (datetime.now() - self.cache[key]['timestamp']).total_seconds()
         return cache_age < self.cache_duration
     
+    async def _fetch_once(self, key: str, fetch) -> Dict[str, Any]:
+        """Run fetch for key, sharing one in-flight call among concurrent callers"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so a cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(future)
+    
     async def fetch_with_retry(self, url: str, params: Dict[str, Any], max_retries: int = 3) -> Optional[Dict[str, Any]]:
         """Fetch data with retry logic"""
         for attempt in range(max_retries):
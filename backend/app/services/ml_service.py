@@ -4,13 +4,52 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+from sklearn.base import clone
 import joblib
 import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from app.api.v1.schemas import Investment, Expense, Loan, CreditCard
 from app.core.config import settings
 
+# Model fitting holds the GIL for much of its run, so it gets a worker process
+# (spawned, not forked, since the server process runs threads). Fits are small and
+# every server worker has its own pool, so one fitting process each is enough
+FIT_POOL_WORKERS = 1
+_fit_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_fit_pool() -> ProcessPoolExecutor:
+    """Get the process pool used for model fitting, starting it on first use"""
+    global _fit_pool
+    if _fit_pool is None:
+        _fit_pool = ProcessPoolExecutor(
+            max_workers=FIT_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _fit_pool
+
+def _warm_worker() -> None:
+    """No-op task; unpickling it imports this module in the worker process"""
+
+async def warm_fit_pool():
+    """Spawn the fitting processes and import this module in them ahead of the first request"""
+    loop = asyncio.get_running_loop()
+    pool = _get_fit_pool()
+    await asyncio.gather(*(loop.run_in_executor(pool, _warm_worker) for _ in range(FIT_POOL_WORKERS)))
+
+def shutdown_fit_pool():
+    """Stop the fitting processes, if they were started"""
+    global _fit_pool
+    if _fit_pool is not None:
+        _fit_pool.shutdown(cancel_futures=True)
+        _fit_pool = None
+
+def _fit_anomaly_indices(detector: IsolationForest, features: np.ndarray) -> np.ndarray:
+    """Row positions a fresh fit of detector flags as outliers (runs in a worker process)"""
+    return np.flatnonzero(clone(detector).fit_predict(features) == -1)
+
 class MLAnalysisService:
     """
     Machine Learning service for financial analysis
@@ -38,25 +77,27 @@ class MLAnalysisService:
             return []
         
         try:
-            # Feature engineering
-            features = self._extract_spending_features(expense_df)
-            
-            # Detect anomalies
-            anomaly_scores = self.models['anomaly_detector'].fit_predict(features)
+            # Feature extraction and model fitting are CPU-bound; keep them off the event loop.
+            # Only the feature matrix crosses to the worker process, not the DataFrame.
+            features = await asyncio.to_thread(self._extract_spending_features, expense_df)
+            anomaly_idx = await asyncio.get_running_loop().run_in_executor(
+                _get_fit_pool(), _fit_anomaly_indices, self.models['anomaly_detector'], features
+            )
             
             # Return anomalous transactions
-            anomalies = []
-            for idx, score in enumerate(anomaly_scores):
-                if score == -1:  # Anomaly
-                    anomalies.append({
-                        'index': idx,
-                        'amount': expense_df.iloc[idx]['amount'],
-                        'category': expense_df.iloc[idx]['category'],
-                        'date': expense_df.iloc[idx]['date'],
-                        'reason': 'Unusual spending pattern detected'
-                    })
-            
-            return anomalies
+            amounts = expense_df['amount'].to_numpy()
+            categories = expense_df['category'].to_numpy()
+            dates = expense_df['date']
+            return [
+                {
+                    'index': int(idx),
+                    'amount': amounts[idx],
+                    'category': categories[idx],
+                    'date': dates.iloc[idx],
+                    'reason': 'Unusual spending pattern detected'
+                }
+                for idx in anomaly_idx
+            ]
             
         except Exception as e:
             print(f"Error in anomaly detection: {e}")
@@ -65,24 +106,21 @@ class MLAnalysisService:
     def _extract_spending_features(self, expense_df: pd.DataFrame) -> np.ndarray:
         """Extract features for ML analysis"""
         try:
-            # Time-based features
-            expense_df['hour'] = expense_df['date'].dt.hour
-            expense_df['day_of_week'] = expense_df['date'].dt.dayofweek
-            expense_df['month'] = expense_df['date'].dt.month
-            
-            # Amount features
-            expense_df['log_amount'] = np.log1p(expense_df['amount'])
+            # Fixed layout: log amount, hour, day of week, month, then one column per category
+            dates = expense_df['date'].dt
+            category_codes, categories = pd.factorize(expense_df['category'], sort=True)
             
-            # Category encoding (simple)
-            category_encoded = pd.get_dummies(expense_df['category'], prefix='cat')
+            features = np.zeros((len(expense_df), 4 + len(categories)), dtype=np.float64)
+            features[:, 0] = np.log1p(expense_df['amount'].to_numpy(dtype=np.float64))
+            features[:, 1] = dates.hour.to_numpy()
+            features[:, 2] = dates.dayofweek.to_numpy()
+            features[:, 3] = dates.month.to_numpy()
             
-            # Combine features
-            features = pd.concat([
-                expense_df[['log_amount', 'hour', 'day_of_week', 'month']],
-                category_encoded
-            ], axis=1)
+            # Category encoding (one-hot); missing categories get code -1 and no column
+            rows = np.flatnonzero(category_codes >= 0)
+            features[rows, 4 + category_codes[rows]] = 1.0
             
-            return features.fillna(0).values
+            return np.nan_to_num(features)
             
         except Exception as e:
             print(f"Error extracting features: {e}")
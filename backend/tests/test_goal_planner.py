@@ -0,0 +1,46 @@
+"""
+Tests for the goal planner's batch SIP analysis
+"""
+
+import asyncio
+import math
+from datetime import datetime, timedelta
+
+from app.services.goal_planner import FinancialGoal, GoalPlannerService, GoalType
+
+
+def _goal_due_tomorrow(goal_id: str, current_amount: float) -> FinancialGoal:
+    return FinancialGoal(
+        id=goal_id,
+        name="Car Goal",
+        goal_type=GoalType.CAR,
+        target_amount=100000,
+        target_date=datetime.now() + timedelta(hours=12),
+        current_amount=current_amount,
+        monthly_contribution=0,
+        priority=1,
+        description="Due within a day",
+        is_flexible=True
+    )
+
+
+def test_plan_with_goal_due_tomorrow_matches_single_goal_analysis():
+    service = GoalPlannerService()
+    user_profile = {"available_for_investment": 20000}
+    unfunded = _goal_due_tomorrow("unfunded", 0)
+    funded = _goal_due_tomorrow("funded", 200000)
+
+    plan = asyncio.run(service.generate_comprehensive_goal_plan([unfunded, funded], user_profile))
+
+    assert "error" not in plan
+    assert math.isfinite(plan["total_required_sip"])
+    for analysis, goal in zip(plan["goal_analyses"], (unfunded, funded)):
+        single = asyncio.run(service.analyze_goal(goal, user_profile))
+        assert analysis == single
+        assert math.isfinite(analysis.required_monthly_sip)
+        assert math.isfinite(analysis.projected_final_amount)
+
+    # The unfunded goal falls back to the default analysis, the funded one short-circuits
+    assert plan["goal_analyses"][0].recommended_funds == []
+    assert plan["goal_analyses"][0].required_monthly_sip == 5000.0
+    assert plan["goal_analyses"][1].required_monthly_sip == 0.0